@@ -1,11 +1,20 @@
+import time
+SCRIPT_START = time.perf_counter()
+
 import streamlit as st
-import pandas as pd
-import joblib
-import plotly.graph_objects as go
 import os
-from generate_report import create_report_pdf  
+from concurrent.futures import ThreadPoolExecutor
+from model_registry import resolve
+from instrumentation import (batch_rows, cache_rows, observe, profiler, prometheus_text, reset, stage_rows,
+                             start_profiler_from_env, timed, track_cache)
+from startup_timing import StartupTimer, background_stages, finish, record_background, timing_rows
+# pandas, plotly, xgboost and fpdf are imported inside the features that use them,
+# so the first screen renders without waiting for them
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+timer = StartupTimer('app', SCRIPT_START)
+timer.mark('imports')
+start_profiler_from_env()
 
 #Page Configuration
 st.set_page_config(
@@ -25,21 +34,104 @@ if os.path.exists('.streamlit/style.css'):
 else:
     st.warning("Custom CSS file not found. App will use default styling.")
 
+#Diagnostics (hidden: open the app with ?diagnostics=1)
+# Numbers are for this server process and cover every page and session it served
+if st.query_params.get('diagnostics') == '1':
+    st.title('🩺 Diagnostics')
+    st.caption("Latencies are bucketed, so p50/p95 are the upper bounds of their buckets.")
+    st.write("#### Stage Latency")
+    st.dataframe(stage_rows(), hide_index=True, use_container_width=True)
+    dcol1, dcol2 = st.columns(2)
+    with dcol1:
+        st.write("#### Cache Hit Rates")
+        st.dataframe(cache_rows(), hide_index=True, use_container_width=True)
+    with dcol2:
+        st.write("#### Model Call Batch Sizes")
+        st.dataframe(batch_rows(), hide_index=True, use_container_width=True)
+
+    running_profiler = profiler()
+    if running_profiler is not None:
+        st.info(f"Sampling profiler on: {running_profiler.samples:,} samples, written to `{running_profiler.path}`")
+    else:
+        st.caption("Sampling profiler off. Start the app with CHURN_PROFILE=1 to record folded stacks under .cache/profiles.")
+
+    metrics_text = prometheus_text()
+    xcol1, xcol2 = st.columns(2)
+    with xcol1:
+        st.download_button("Download Metrics (Prometheus text)", data=metrics_text, file_name='churn_metrics.prom',
+                           mime='text/plain', use_container_width=True)
+    with xcol2:
+        if st.button("Reset Counters", use_container_width=True):
+            reset()
+            st.rerun()
+    with st.expander("Prometheus text"):
+        st.code(metrics_text, language='text')
+    st.stop()
+
 #  Load Model
-# Use st.cache_resource for one-time loading of heavy objects like models
-@st.cache_resource
-def load_model():
-    try:
-        pipeline = joblib.load('models/churn_predictor.joblib')
-        return pipeline
-    except FileNotFoundError:
-        return None
-
-pipeline = load_model()
-if pipeline is None:
-    st.error("Model file not found. Please ensure 'models/churn_predictor.joblib' exists.")
+# The registry's active version is looked up on every rerun, so activating a
+# new version takes effect on the next interaction without restarting the app
+MODEL_VERSION, MODEL_PATH = resolve('active')
+if not os.path.exists(MODEL_PATH):
+    st.error(f"Model file not found. Please ensure '{os.path.relpath(MODEL_PATH, BASE_DIR)}' exists.")
     st.stop()
 
+def _load_model(model_path):
+    start = time.perf_counter()
+    import io
+    import joblib
+    from file_hash import read_with_sha256
+    # Loaded from the bytes that were hashed, so reports can tell exactly which model this is
+    data, model_sha256 = read_with_sha256(model_path)
+    pipeline = joblib.load(io.BytesIO(data))
+    record_background('model_load', time.perf_counter() - start)
+    return pipeline, model_sha256
+
+# Deserialization (which also imports sklearn and xgboost) starts on a background
+# thread, so the page and sidebar render while it runs. Every session shares the future.
+# Keyed on the file's (mtime, size) as well, so a model file replaced in place is reloaded.
+@track_cache('app.start_model_load', st.cache_resource(max_entries=2))
+def start_model_load(model_path, file_version):
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='model-loader')
+    future = executor.submit(_load_model, model_path)
+    # The submitted load still runs; the thread exits once it finishes
+    executor.shutdown(wait=False)
+    return future
+
+model_stat = os.stat(MODEL_PATH)
+MODEL_FILE_VERSION = (model_stat.st_mtime_ns, model_stat.st_size)
+model_future = start_model_load(MODEL_PATH, MODEL_FILE_VERSION)
+
+def get_pipeline():
+    with timer.stage('model_wait'):
+        try:
+            return model_future.result()[0]
+        except Exception:
+            # A failed load is not kept, so the next rerun tries again
+            start_model_load.clear(MODEL_PATH, MODEL_FILE_VERSION)
+            raise
+
+# Repeated customers skip the model; the on-disk store is shared with batch and API callers
+@track_cache('app.load_prediction_cache', st.cache_resource(max_entries=2))
+def load_prediction_cache(model_path):
+    from prediction_cache import DEFAULT_STORE_PATH, PredictionCache
+    return PredictionCache(get_pipeline(), model_path, store_path=DEFAULT_STORE_PATH)
+
+# Per-customer contributions, cached next to the predictions under the same keys
+@track_cache('app.load_explanation_cache', st.cache_resource(max_entries=2))
+def load_explanation_cache(model_path):
+    from explain import ExplanationCache
+    from prediction_cache import DEFAULT_STORE_PATH
+    return ExplanationCache(get_pipeline(), model_path, store_path=DEFAULT_STORE_PATH)
+
+# One report builder for every session; repeated requests during a build share it
+@track_cache('app.get_report_worker', st.cache_resource)
+def get_report_worker():
+    from generate_report import ReportWorker
+    return ReportWorker()
+
+REPORT_POLL_SECONDS = 1.0
+
 
 #App Layout 
 st.title('🚀 Customer Churn Prediction System')
@@ -47,6 +139,7 @@ st.markdown("""
 Welcome to the interactive Churn Prediction dashboard. Use the sidebar to enter a customer's details and our AI model will predict their churn probability. 
 Navigate to the **Dashboard & Visualizations** page for an overview of churn drivers.
 """)
+st.caption(f"Model version: {MODEL_VERSION}")
 
 #Sidebar for User Input 
 with st.sidebar:
@@ -80,6 +173,8 @@ with st.sidebar:
     is_senior = st.checkbox('Is Senior Citizen?')
     user_inputs['SeniorCitizen'] = 1 if is_senior else 0
 
+timer.mark('first_render')
+
 
 #Main Area for Prediction Output and Report 
 col1, col2 = st.columns([0.6, 0.4], gap="large")
@@ -87,13 +182,17 @@ col1, col2 = st.columns([0.6, 0.4], gap="large")
 with col1:
     st.header("Churn Prediction")
     if st.button('Predict Churn', use_container_width=True):
-        input_df = pd.DataFrame([user_inputs])
-        prediction_proba = pipeline.predict_proba(input_df)[0]
-        churn_probability = prediction_proba[1]
+        import plotly.graph_objects as go
+        from explain import top_drivers
+        with timed('app.predict'):
+            churn_probability = load_prediction_cache(MODEL_PATH).predict_one(user_inputs)
+            explanation = load_explanation_cache(MODEL_PATH).explain_one(user_inputs)
+            drivers = top_drivers(explanation, user_inputs, k=5)
 
         #SAVE TO SESSION STATE
         st.session_state['last_prediction_inputs'] = user_inputs
         st.session_state['last_prediction_probability'] = churn_probability
+        st.session_state['last_prediction_drivers'] = drivers
 
         # Display the result with a dynamic message
         if churn_probability > 0.7:
@@ -107,40 +206,126 @@ with col1:
             st.info('Recommendation: No immediate action needed. Continue with standard customer engagement.')
             
         # Probability Gauge
-        fig = go.Figure(go.Indicator(
-            mode = "gauge+number",
-            value = churn_probability * 100,
-            domain = {'x': [0, 1], 'y': [0, 1]},
-            title = {'text': "Churn Probability (%)", 'font': {'size': 24}},
-            gauge = {
-                'axis': {'range': [None, 100], 'tickwidth': 1, 'tickcolor': "darkblue"},
-                'bar': {'color': "#262730"},
-                'bgcolor': "white",
-                'borderwidth': 2,
-                'bordercolor': "gray",
-                'steps': [
-                    {'range': [0, 40], 'color': 'rgba(44, 160, 44, 0.7)'}, # Green
-                    {'range': [40, 70], 'color': 'rgba(255, 127, 14, 0.7)'}, # Orange
-                    {'range': [70, 100], 'color': 'rgba(214, 39, 40, 0.7)'}  # Red
-                ]
-            }))
-        fig.update_layout(height=300)
+        with timed('app.gauge_figure'):
+            fig = go.Figure(go.Indicator(
+                mode = "gauge+number",
+                value = churn_probability * 100,
+                domain = {'x': [0, 1], 'y': [0, 1]},
+                title = {'text': "Churn Probability (%)", 'font': {'size': 24}},
+                gauge = {
+                    'axis': {'range': [None, 100], 'tickwidth': 1, 'tickcolor': "darkblue"},
+                    'bar': {'color': "#262730"},
+                    'bgcolor': "white",
+                    'borderwidth': 2,
+                    'bordercolor': "gray",
+                    'steps': [
+                        {'range': [0, 40], 'color': 'rgba(44, 160, 44, 0.7)'}, # Green
+                        {'range': [40, 70], 'color': 'rgba(255, 127, 14, 0.7)'}, # Orange
+                        {'range': [70, 100], 'color': 'rgba(214, 39, 40, 0.7)'}  # Red
+                    ]
+                }))
+            fig.update_layout(height=300)
         st.plotly_chart(fig, use_container_width=True)
 
+        # Top Drivers (contributions of this customer's own values to the model's score)
+        st.write("#### Top Drivers of This Prediction")
+        st.dataframe([
+            {
+                'Feature': d['feature'],
+                'Customer Value': d['value'],
+                'Effect': '🔺 Raises risk' if d['contribution'] > 0 else '🔻 Lowers risk',
+                'Impact (log-odds)': round(d['contribution'], 3)
+            }
+            for d in drivers
+        ], hide_index=True, use_container_width=True)
+
 with col2:
     st.header("Download Full Report")
     st.markdown("Generate a comprehensive PDF report with project methodology, key findings, and business recommendations.")
     
-    # When the user clicks, generate the PDF and provide it for download.
-    # The file is generated on-the-fly.
-    report_path = create_report_pdf()
-    with open(report_path, "rb") as pdf_file:
-        PDFbyte = pdf_file.read()
-    
-    st.download_button(
-        label="Download Report PDF",
-        data=PDFbyte,
-        file_name=os.path.basename(report_path),
-        mime='application/pdf',
-        use_container_width=True
-    )
\ No newline at end of file
+    # Built on a background thread only when asked for, so predictions never wait on it
+    if st.button('Generate Report', use_container_width=True):
+        st.session_state.pop('report_pdf', None)
+        st.session_state['report_job'] = get_report_worker().submit(
+            model_version=MODEL_VERSION, model_path=MODEL_PATH, load_pipeline=model_future.result
+        )
+
+    # Only this fragment reruns while a build is in progress. It keeps polling
+    # after the build finishes until the next full rerun, which is a cheap no-op.
+    report_job = st.session_state.get('report_job')
+    @st.fragment(run_every=REPORT_POLL_SECONDS if report_job is not None and not report_job.done() else None)
+    def report_status():
+        job = st.session_state.get('report_job')
+        if job is not None and job.done():
+            del st.session_state['report_job']
+            try:
+                st.session_state['report_pdf'] = job.result()
+            except Exception as e:
+                st.error(f"Report generation failed: {e}")
+        elif job is not None:
+            st.progress(job.fraction, text=job.message)
+
+        if 'report_pdf' in st.session_state:
+            report_path, PDFbyte = st.session_state['report_pdf']
+            st.download_button(
+                label="Download Report PDF",
+                data=PDFbyte,
+                file_name=os.path.basename(report_path),
+                mime='application/pdf',
+                use_container_width=True
+            )
+
+    report_status()
+
+#What-If Analysis
+st.markdown("---")
+st.header("What-If Retention Analysis")
+st.markdown("See how this customer's churn probability moves under every single change to their plan, without re-running predictions one at a time.")
+
+# Every variant (each alternative field value plus a tenure x MonthlyCharges grid) is scored in one batch
+if st.toggle('Show what-if analysis for the customer in the sidebar'):
+    import plotly.graph_objects as go
+    from what_if import best_reductions, sweep
+    with timed('app.what_if'):
+        base_probability, changes_table, charge_grid = sweep(get_pipeline(), user_inputs)
+        reductions = best_reductions(changes_table)
+
+    wcol1, wcol2 = st.columns([0.5, 0.5], gap="large")
+    with wcol1:
+        st.write(f"#### Changes That Reduce Churn Most (current: {base_probability:.1%})")
+        if reductions.empty:
+            st.info("No single change lowers this customer's churn probability.")
+        else:
+            st.dataframe([
+                {
+                    'Change': f"{row.field}: {row.current} → {row.new_value}",
+                    'New Probability': f"{row.churn_probability:.1%}",
+                    'Difference': f"{row.change * 100:+.1f} pts"
+                }
+                for row in reductions.itertuples()
+            ], hide_index=True, use_container_width=True)
+
+    with wcol2:
+        st.write("#### Churn Probability by Tenure and Monthly Charges")
+        with timed('app.what_if_figure'):
+            fig_grid = go.Figure(go.Heatmap(
+                z=charge_grid.to_numpy().T * 100,
+                x=charge_grid.index, y=charge_grid.columns,
+                colorscale='RdYlGn_r', zmin=0, zmax=100,
+                colorbar={'title': 'Churn %'},
+                hovertemplate='tenure %{x}<br>MonthlyCharges %{y}<br>churn %{z:.1f}%<extra></extra>'
+            ))
+            fig_grid.add_trace(go.Scatter(
+                x=[user_inputs['tenure']], y=[user_inputs['MonthlyCharges']], mode='markers',
+                marker={'symbol': 'x', 'size': 14, 'color': 'black'}, name='This customer'
+            ))
+            fig_grid.update_layout(xaxis_title='tenure', yaxis_title='MonthlyCharges', height=400, showlegend=False)
+        st.plotly_chart(fig_grid, use_container_width=True)
+
+#Startup Timing
+observe('app.rerun', time.perf_counter() - SCRIPT_START)
+process_report, session_report = finish(timer, st.session_state)
+with st.expander("⏱️ Startup timing"):
+    st.caption("Seconds from the start of the page script. 'first_render' is when the title and sidebar had been sent.")
+    st.dataframe(timing_rows(process_report, session_report, background_stages()),
+                 hide_index=True, use_container_width=True)
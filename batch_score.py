@@ -0,0 +1,309 @@
+import argparse
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import pandas as pd
+
+from drift import DEFAULT_LIVE_PATH, DriftMonitor
+from explain import DEFAULT_TOP_DRIVERS, ExplanationCache, TreeExplainer, top_driver_columns
+from features import FEATURE_COLUMNS, ID_COLUMN, clean_raw_frame, risk_tier
+from model_registry import ShadowScorer, ShadowStats, resolve
+from prediction_cache import DEFAULT_STORE_PATH, PredictionCache
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MODEL_PATH = os.path.join(BASE_DIR, 'models', 'churn_predictor.joblib')
+DEFAULT_CHUNK_SIZE = 50_000
+
+# Pipelines loaded once in the parent and inherited by forked workers
+_shared_pipelines = {}
+# Scorer (and explainer) set up once per worker process by _init_worker
+_worker_pipeline = None
+_worker_explainer = None
+_worker_explain_top = 0
+_worker_monitor = None
+
+
+def resolve_model_path(model_path=None):
+    """model_path, or the registry's active version when it is None."""
+    if model_path is None:
+        _, model_path = resolve('active')
+    return model_path
+
+
+def load_pipeline(model_path=DEFAULT_MODEL_PATH):
+    pipeline = _shared_pipelines.get(model_path)
+    return pipeline if pipeline is not None else joblib.load(model_path)
+
+
+def share_with_workers(model_paths):
+    """Loads the models once so forked workers inherit them rather than each loading a copy.
+
+    Returns the pool's multiprocessing context: fork where the platform has
+    it, otherwise None (the default start method, where workers load their own).
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods():
+        return None
+    for model_path in model_paths:
+        if model_path not in _shared_pipelines:
+            _shared_pipelines[model_path] = joblib.load(model_path)
+    return multiprocessing.get_context('fork')
+
+
+def single_thread(pipeline):
+    """Keeps the pipeline's XGBoost model from spawning extra threads; returns the pipeline."""
+    pipeline.named_steps['classifier'].get_booster().set_param('nthread', 1)
+    return pipeline
+
+
+def _cached_or_plain(model_path, cache_path, prepare):
+    pipeline = load_pipeline(model_path)
+    if prepare is not None:
+        prepare(pipeline)
+    if cache_path:
+        return PredictionCache(pipeline, model_path, store_path=cache_path, on_reload=prepare)
+    return pipeline
+
+
+def make_scorer(model_path=None, cache_path=None, shadow_path=None, prepare=None):
+    """The pipeline, or a PredictionCache in front of it when cache_path is set.
+
+    With shadow_path, the result is a ShadowScorer that also scores every
+    batch with that candidate model and returns the active scores; the
+    candidate gets the same cache as the active model, so their latencies
+    compare like with like. prepare(pipeline) is applied to every pipeline
+    the scorer uses, including ones a cache reloads.
+    """
+    model_path = resolve_model_path(model_path)
+    scorer = _cached_or_plain(model_path, cache_path, prepare)
+    if shadow_path:
+        scorer = ShadowScorer(scorer, _cached_or_plain(shadow_path, cache_path, prepare))
+    return scorer
+
+
+def make_explainer(scorer, model_path=DEFAULT_MODEL_PATH, cache_path=None, approximate=False, prepare=None):
+    """Tree explainer for the scorer's pipeline, cached next to the predictions when cache_path is set."""
+    pipeline = getattr(scorer, 'pipeline', scorer)
+    if cache_path:
+        return ExplanationCache(pipeline, model_path, approximate=approximate, store_path=cache_path,
+                                on_reload=prepare)
+    return TreeExplainer(pipeline, approximate)
+
+
+def make_monitor(drift_path=None):
+    """Drift monitor that adds every scored chunk to the live statistics, or None."""
+    # Chunks are large, so each one is written to the store as soon as it is scored
+    return DriftMonitor(drift_path, flush_rows=1) if drift_path else None
+
+
+def _init_worker(model_path, cache_path=None, explain_top=0, approximate_explain=False, drift_path=None,
+                 shadow_path=None):
+    global _worker_pipeline, _worker_explainer, _worker_explain_top, _worker_monitor
+    # Each process scores its own shard, so keep XGBoost from spawning extra threads. The
+    # pin goes on the pipelines the scorer holds: inherited ones under fork, fresh loads otherwise.
+    _worker_pipeline = make_scorer(model_path, None, shadow_path, prepare=single_thread)
+    if explain_top:
+        _worker_explainer = make_explainer(_worker_pipeline, model_path, cache_path, approximate_explain,
+                                           prepare=single_thread)
+        _worker_explain_top = explain_top
+    _worker_monitor = make_monitor(drift_path)
+
+
+def _score_in_worker(chunk):
+    scored = score_chunk(_worker_pipeline, chunk, _worker_explainer, _worker_explain_top, _worker_monitor)
+    shadow_stats = _worker_pipeline.take_stats() if isinstance(_worker_pipeline, ShadowScorer) else None
+    return scored, shadow_stats
+
+
+def read_chunks(input_path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yields cleaned chunks of a Telco-shaped CSV without loading the whole file.
+
+    An empty file, or one with only a header, yields nothing.
+    """
+    # TotalCharges contains blanks, so read it as text and coerce it per chunk
+    try:
+        reader = pd.read_csv(input_path, chunksize=chunk_size, dtype={'TotalCharges': str})
+    except pd.errors.EmptyDataError:
+        return
+    row_offset = 0
+    for chunk in reader:
+        if chunk.empty:
+            continue
+        if ID_COLUMN not in chunk.columns:
+            chunk[ID_COLUMN] = pd.RangeIndex(row_offset, row_offset + len(chunk)).astype(str)
+        row_offset += len(chunk)
+        yield clean_raw_frame(chunk)
+
+
+def score_chunk(scorer, chunk, explainer=None, explain_top=0, monitor=None):
+    """Scores one chunk with a single vectorized predict_proba call.
+
+    With an explainer, the chunk's contributions are computed in one more
+    vectorized pass and its explain_top drivers are appended per row. With a
+    monitor, the chunk's inputs and scores are added to the drift statistics.
+    """
+    probabilities = scorer.predict_proba(chunk[FEATURE_COLUMNS])[:, 1]
+    if monitor is not None:
+        monitor.observe(chunk, probabilities)
+    scored = pd.DataFrame({
+        ID_COLUMN: chunk[ID_COLUMN].values,
+        'churn_probability': probabilities,
+        'risk_tier': risk_tier(probabilities)
+    })
+    if explainer is not None and explain_top:
+        contributions = explainer.contributions(chunk)
+        for name, values in top_driver_columns(contributions, chunk, explain_top).items():
+            scored[name] = values
+    return scored
+
+
+def output_columns(explain_top=0):
+    """Columns of the scored output, in order."""
+    columns = [ID_COLUMN, 'churn_probability', 'risk_tier']
+    for rank in range(1, explain_top + 1):
+        columns += [f'top_driver_{rank}', f'top_driver_{rank}_impact']
+    return columns
+
+
+def write_scores(scored_chunks, output_path, explain_top=0):
+    """Appends scored chunks to output_path and returns the number of rows written.
+
+    An input without rows still gets a header-only output, so jobs reading
+    output_path find the file.
+    """
+    rows = 0
+    written = False
+    for scored in scored_chunks:
+        scored.to_csv(output_path, mode='a' if written else 'w', header=not written, index=False)
+        written = True
+        rows += len(scored)
+    if not written:
+        pd.DataFrame(columns=output_columns(explain_top)).to_csv(output_path, index=False)
+    return rows
+
+
+def score_chunks_parallel(chunks, model_path, workers, cache_path=None, explain_top=0, approximate_explain=False,
+                          drift_path=None, shadow_path=None, shadow_stats=None):
+    """Scores chunks on a process pool and yields results in input order.
+
+    At most two shards per worker are in flight, so memory stays bounded by
+    the chunk size rather than the input size. Where fork is available the
+    models are loaded once here and shared with every worker.
+    """
+    context = share_with_workers(filter(None, (model_path, shadow_path)))
+    initargs = (model_path, cache_path, explain_top, approximate_explain, drift_path, shadow_path)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_init_worker,
+                             initargs=initargs) as pool:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(pool.submit(_score_in_worker, chunk))
+            if len(pending) >= 2 * workers:
+                yield _collect(pending.popleft(), shadow_stats)
+        while pending:
+            yield _collect(pending.popleft(), shadow_stats)
+
+
+def _collect(future, shadow_stats):
+    scored, chunk_stats = future.result()
+    if chunk_stats is not None and shadow_stats is not None:
+        shadow_stats.merge(chunk_stats)
+    return scored
+
+
+def score_file(input_path, output_path, model_path=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=1,
+               cache_path=None, explain_top=0, approximate_explain=False, drift_path=None, shadow_stats=None):
+    """Scores every row of input_path in chunks and returns (rows, seconds).
+
+    model_path defaults to the registry's active version. With workers > 1
+    the chunks are scored as shards on a process pool. cache_path only
+    caches explanations: recomputing a chunk's probabilities is faster than
+    reading them back from the store, while its contributions are not.
+    explain_top > 0 adds that many top drivers per customer. With drift_path
+    set, the scored traffic is added to the drift monitor's live statistics.
+    With a ShadowStats as shadow_stats, every chunk is also scored by the
+    registry's candidate model and agreement and latency are added to it.
+    """
+    start = time.perf_counter()
+    model_path = resolve_model_path(model_path)
+    shadow_path = None
+    if shadow_stats is not None:
+        _, shadow_path = resolve('candidate')
+        if shadow_path is None:
+            raise ValueError('Shadow scoring needs a candidate model; register one with model_registry.py.')
+    chunks = read_chunks(input_path, chunk_size)
+    if workers > 1:
+        scored_chunks = score_chunks_parallel(chunks, model_path, workers, cache_path, explain_top,
+                                              approximate_explain, drift_path, shadow_path, shadow_stats)
+        rows = write_scores(scored_chunks, output_path, explain_top)
+    else:
+        scorer = make_scorer(model_path, None, shadow_path)
+        explainer = make_explainer(scorer, model_path, cache_path, approximate_explain) if explain_top else None
+        monitor = make_monitor(drift_path)
+        scored_chunks = (score_chunk(scorer, chunk, explainer, explain_top, monitor) for chunk in chunks)
+        rows = write_scores(scored_chunks, output_path, explain_top)
+        if shadow_path:
+            shadow_stats.merge(scorer.take_stats())
+    return rows, time.perf_counter() - start
+
+
+def compare_throughput(input_path, output_path, model_path=None, chunk_size=DEFAULT_CHUNK_SIZE, workers=2):
+    """Scores the file serially and in parallel, checks the outputs match and reports both rates."""
+    serial_path = output_path + '.serial'
+    serial_rows, serial_seconds = score_file(input_path, serial_path, model_path, chunk_size, workers=1)
+    rows, seconds = score_file(input_path, output_path, model_path, chunk_size, workers=workers)
+
+    with open(serial_path, 'rb') as f_serial, open(output_path, 'rb') as f_parallel:
+        identical = f_serial.read() == f_parallel.read()
+    os.remove(serial_path)
+
+    print(f"Serial:   {serial_rows:,} rows in {serial_seconds:.2f}s ({serial_rows / serial_seconds:,.0f} rows/sec)")
+    print(f"Parallel: {rows:,} rows in {seconds:.2f}s ({rows / seconds:,.0f} rows/sec) with {workers} workers")
+    print(f"Speedup: {serial_seconds / seconds:.2f}x, outputs identical: {identical}")
+    return identical
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score a customer CSV with the churn model in chunks.')
+    parser.add_argument('input', help='CSV shaped like data/raw/WA_Fn-UseC_-Telco-Customer-Churn.csv')
+    parser.add_argument('output', help='Where to write customerID, churn_probability and risk_tier')
+    parser.add_argument('--model', default=None,
+                        help="Path to a saved pipeline (default: the registry's active version)")
+    parser.add_argument('--chunk-size', type=int, default=DEFAULT_CHUNK_SIZE, help='Rows per chunk')
+    parser.add_argument('--workers', type=int, default=1, help='Worker processes; each loads the model once')
+    parser.add_argument('--compare', action='store_true', help='Also run serially and report the speedup')
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_STORE_PATH, default=None, metavar='PATH',
+                        help='Reuse --explain contributions from the on-disk cache (shared by all workers)')
+    parser.add_argument('--explain', type=int, nargs='?', const=DEFAULT_TOP_DRIVERS, default=0, metavar='K',
+                        help='Append each customer\'s top K drivers (default 3) from per-customer contributions')
+    parser.add_argument('--approximate-explain', action='store_true',
+                        help='Use the fast per-path attribution instead of exact TreeSHAP for --explain')
+    parser.add_argument('--drift', nargs='?', const=DEFAULT_LIVE_PATH, default=None, metavar='PATH',
+                        help='Add the scored customers to the drift monitor\'s live statistics')
+    parser.add_argument('--shadow', action='store_true',
+                        help="Also score with the registry's candidate model and report agreement and latency")
+    args = parser.parse_args()
+
+    if args.compare:
+        identical = compare_throughput(args.input, args.output, args.model, args.chunk_size, max(args.workers, 2))
+        raise SystemExit(0 if identical else 1)
+
+    shadow_stats = ShadowStats() if args.shadow else None
+    rows, seconds = score_file(args.input, args.output, args.model, args.chunk_size, args.workers, args.cache,
+                               args.explain, args.approximate_explain, args.drift, shadow_stats)
+    rate = rows / seconds if seconds > 0 else float('inf')
+    print(f"Scored {rows:,} rows in {seconds:.2f}s ({rate:,.0f} rows/sec) -> {args.output}")
+    if shadow_stats is not None:
+        shadow = shadow_stats.snapshot()
+        if shadow['rows']:
+            print(f"Shadow: risk tier agreement {shadow['risk_tier_agreement']:.2%}, "
+                  f"mean |diff| {shadow['mean_abs_probability_diff']:.4f}, "
+                  f"candidate latency {shadow['latency_overhead']:.2f}x active")
+        if shadow['candidate_failures']:
+            print(f"Shadow: the candidate failed on {shadow['candidate_failures']:,} chunk(s)")
+
+
+if __name__ == '__main__':
+    main()
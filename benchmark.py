@@ -0,0 +1,243 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+import joblib
+import numpy as np
+import pandas as pd
+
+import data_store
+from dashboard_cube import AggregateCube
+from explain import TreeExplainer
+from features import ID_COLUMN
+from generate_report import build_report_pdf, collect_content, load_driver_analysis, render_charts
+from model_registry import LEGACY_VERSION
+from what_if import sweep
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODEL_PATH = os.path.join(BASE_DIR, 'models', 'churn_predictor.joblib')
+DEFAULT_OUTPUT = os.path.join(BASE_DIR, 'benchmarks', 'results.json')
+BATCH_SIZES = (1, 10, 100, 1000, 10000)
+EXPLAIN_BATCH_SIZES = (1, 100, 1000)
+DEFAULT_SCALES = (10, 100)
+# A result counts as a regression when it is this much worse than the baseline
+DEFAULT_THRESHOLD = 0.20
+# Filter used for the dashboard filter+KPI measurement
+DASHBOARD_FILTERS = {'Contract': ['Month-to-month', 'One year'], 'InternetService': ['DSL', 'Fiber optic']}
+
+
+def timed(fn, repeats=1):
+    """Best-of-n wall time in seconds and the last return value."""
+    best, result = float('inf'), None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def synthesize(df, n_rows, seed=42):
+    """Synthetic customers drawn from the Telco data's distributions.
+
+    Rows are bootstrapped so categorical combinations stay realistic, then
+    tenure and charges are jittered and TotalCharges is kept consistent with
+    tenure x MonthlyCharges.
+    """
+    rng = np.random.default_rng(seed)
+    sample = df.iloc[rng.integers(0, len(df), n_rows)].reset_index(drop=True)
+    tenure = np.clip(sample['tenure'].to_numpy() + rng.integers(-3, 4, n_rows), 0, 72)
+    monthly = np.clip(sample['MonthlyCharges'].to_numpy(dtype=np.float64) * rng.normal(1, 0.05, n_rows), 18.0, 120.0)
+    sample['tenure'] = tenure
+    sample['MonthlyCharges'] = monthly.round(2)
+    total = (tenure * monthly * rng.normal(1, 0.03, n_rows)).round(2)
+    # Brand-new customers have a blank TotalCharges in the raw CSV
+    sample['TotalCharges'] = np.where(tenure == 0, np.nan, total)
+    sample[ID_COLUMN] = [f'SYN-{i:09d}' for i in range(n_rows)]
+    return sample
+
+
+def write_raw_csv(df, path):
+    """Writes df in the raw CSV layout, with blanks for missing TotalCharges."""
+    out = df.drop(columns=['Churn_numeric'], errors='ignore').copy()
+    out['TotalCharges'] = out['TotalCharges'].map(lambda v: '' if pd.isna(v) else f'{v:.2f}')
+    out.to_csv(path, index=False)
+
+
+def bench_model(results, df, repeats):
+    load_seconds, pipeline = timed(lambda: joblib.load(MODEL_PATH), repeats)
+    results['model.load_seconds'] = load_seconds
+
+    X = data_store.to_model_frame(df)
+    for size in BATCH_SIZES:
+        batch = X.iloc[np.arange(size) % len(X)]
+        seconds, _ = timed(lambda: pipeline.predict_proba(batch), repeats)
+        results[f'predict.batch_{size}.seconds'] = seconds
+        results[f'predict.batch_{size}.rows_per_second'] = size / seconds
+    return pipeline
+
+
+def bench_explain(results, pipeline, df, repeats):
+    """Per-customer explanation cost, exact and approximate, as a multiple of plain scoring."""
+    X = data_store.to_model_frame(df)
+    explainers = {'exact': TreeExplainer(pipeline), 'approx': TreeExplainer(pipeline, approximate=True)}
+    for size in EXPLAIN_BATCH_SIZES:
+        batch = X.iloc[np.arange(size) % len(X)]
+        predict_seconds, _ = timed(lambda: pipeline.predict_proba(batch), repeats)
+        for method, explainer in explainers.items():
+            seconds, _ = timed(lambda: explainer.contributions(batch), repeats)
+            results[f'explain.{method}.batch_{size}.rows_per_second'] = size / seconds
+            results[f'explain.{method}.batch_{size}.cost_vs_predict'] = seconds / predict_seconds
+
+
+def bench_dashboard(results, csv_path, store_path, prefix, repeats):
+    if os.path.exists(store_path):
+        os.remove(store_path)
+    cold, _ = timed(lambda: data_store.load_customers(csv_path, store_path, missing_total_charges='drop'))
+    warm, df = timed(lambda: data_store.load_customers(csv_path, store_path, missing_total_charges='drop'), repeats)
+    results[f'{prefix}.load_data_cold_seconds'] = cold
+    results[f'{prefix}.load_data_warm_seconds'] = warm
+
+    build, cube = timed(lambda: AggregateCube(df), repeats)
+    kpis, _ = timed(lambda: cube.totals(DASHBOARD_FILTERS), repeats)
+    charts, _ = timed(lambda: (cube.rollup(['Contract', 'Churn'], DASHBOARD_FILTERS),
+                               cube.rollup(['InternetService'], DASHBOARD_FILTERS)), repeats)
+    query, _ = timed(lambda: df.query("Contract == @c & InternetService == @i",
+                                      local_dict={'c': DASHBOARD_FILTERS['Contract'],
+                                                  'i': DASHBOARD_FILTERS['InternetService']}), repeats)
+    results[f'{prefix}.cube_build_seconds'] = build
+    results[f'{prefix}.filter_kpi_seconds'] = kpis
+    results[f'{prefix}.filter_charts_seconds'] = charts
+    results[f'{prefix}.scatter_query_seconds'] = query
+    return df
+
+
+def bench_what_if(results, pipeline, df, repeats):
+    """Full what-if sweep for one customer against a single-row prediction."""
+    X = data_store.to_model_frame(df)
+    record = X.iloc[0].to_dict()
+    single, _ = timed(lambda: pipeline.predict_proba(X.iloc[:1]), repeats)
+    seconds, _ = timed(lambda: sweep(pipeline, record), repeats)
+    results['what_if.sweep_seconds'] = seconds
+    results['what_if.cost_vs_single_predict'] = seconds / single
+
+
+def bench_report(results, pipeline, workdir):
+    """Content collection, a cold build (charts drawn) and a build reusing the cached charts."""
+    report_path = os.path.join(workdir, 'report.pdf')
+    seconds, content = timed(lambda: collect_content(LEGACY_VERSION, MODEL_PATH))
+    results['report.collect_seconds'] = seconds
+    # Draw into the scratch folder so every run measures a cold render
+    content['driver_chart'] = os.path.join(workdir, 'drivers.png')
+    content['driver_data'] = os.path.join(workdir, 'drivers.json')
+    content['segment_chart'] = os.path.join(workdir, 'segments.png')
+
+    def build():
+        analysis = load_driver_analysis(content, lambda: pipeline)
+        build_report_pdf(report_path, content, render_charts(content, analysis), analysis)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    build()
+    results['report.build_seconds'] = time.perf_counter() - start
+    results['report.peak_memory_mb'] = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+
+    seconds, _ = timed(build)
+    results['report.cached_charts_build_seconds'] = seconds
+
+
+def run(scales=DEFAULT_SCALES, repeats=3):
+    results = {}
+    workdir = tempfile.mkdtemp(prefix='churn_bench_')
+    try:
+        store_path = os.path.join(workdir, 'telco.feather')
+        df = bench_dashboard(results, data_store.RAW_CSV_PATH, store_path, 'dashboard.base', repeats)
+        pipeline = bench_model(results, df, repeats)
+        bench_explain(results, pipeline, df, repeats)
+        bench_what_if(results, pipeline, df, repeats)
+        bench_report(results, pipeline, workdir)
+
+        for scale in scales:
+            synthetic = synthesize(df, len(df) * scale)
+            csv_path = os.path.join(workdir, f'synthetic_{scale}x.csv')
+            write_raw_csv(synthetic, csv_path)
+            prefix = f'dashboard.scale_{scale}x'
+            scaled = bench_dashboard(results, csv_path, os.path.join(workdir, f'synthetic_{scale}x.feather'),
+                                     prefix, 1)
+            seconds, _ = timed(lambda: pipeline.predict_proba(data_store.to_model_frame(scaled)))
+            results[f'predict.scale_{scale}x.rows_per_second'] = len(scaled) / seconds
+            os.remove(csv_path)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'scales': list(scales)
+        },
+        'results': {name: float(value) for name, value in results.items()}
+    }
+
+
+def higher_is_better(name):
+    return name.endswith('rows_per_second')
+
+
+def compare(current, baseline, threshold=DEFAULT_THRESHOLD):
+    """Returns (name, baseline, current, relative change) for every result worse than threshold."""
+    regressions = []
+    for name, value in current['results'].items():
+        base = baseline['results'].get(name)
+        if not base:
+            continue
+        change = (value - base) / base
+        worse = -change if higher_is_better(name) else change
+        if worse > threshold:
+            regressions.append((name, base, value, change))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the prediction, dashboard and report hot paths.')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='Where to write the results JSON')
+    parser.add_argument('--scales', type=int, nargs='*', default=list(DEFAULT_SCALES),
+                        help='Synthetic dataset sizes as multiples of the Telco CSV (e.g. 10 100 1000)')
+    parser.add_argument('--repeats', type=int, default=3, help='Repeats per measurement (best is kept)')
+    parser.add_argument('--compare', metavar='BASELINE', help='Flag regressions against a saved results JSON')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='Relative slowdown that counts as a regression')
+    args = parser.parse_args()
+
+    current = run(args.scales, args.repeats)
+    folder = os.path.dirname(os.path.abspath(args.output))
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    with open(args.output, 'w') as f:
+        json.dump(current, f, indent=2)
+
+    for name, value in sorted(current['results'].items()):
+        print(f"{name:<55} {value:>14.6g}")
+    print(f"Results written to: {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(current, baseline, args.threshold)
+        for name, base, value, change in regressions:
+            print(f"REGRESSION {name}: {base:.6g} -> {value:.6g} ({change:+.1%})")
+        if regressions:
+            raise SystemExit(1)
+        print(f"No regressions beyond {args.threshold:.0%} against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
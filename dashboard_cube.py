@@ -0,0 +1,87 @@
+import numpy as np
+import pandas as pd
+
+# Filter dimensions of the dashboard sidebar; add a column here to make it filterable
+DEFAULT_DIMENSIONS = ('Contract', 'InternetService')
+
+
+class AggregateCube:
+    """Pre-aggregated counts, churn counts and charge sums per filter cell.
+
+    Cells are keyed by every combination of dimensions plus Churn, so KPIs and
+    grouped charts for any filter selection are sums over a few dozen cells
+    rather than scans over the raw rows. With grid, a pair of
+    (column, bin edges), each cell also keeps its customers' 2-D histogram
+    over those bins, so density charts are sums too.
+    """
+
+    def __init__(self, df, dimensions=DEFAULT_DIMENSIONS, grid=None):
+        self.dimensions = list(dimensions)
+        keys = self.dimensions + ['Churn']
+        frame = df[keys].copy()
+        frame['customers'] = 1
+        frame['churned'] = df['Churn_numeric'].astype(np.int64)
+        frame['monthly_charges_sum'] = df['MonthlyCharges'].astype(np.float64)
+        self.cells = frame.groupby(keys, observed=True, sort=False).sum().reset_index()
+        for col in keys:
+            self.cells[col] = self.cells[col].astype(str)
+        # Filter options in order of first appearance, like df[col].unique()
+        self.members = {dim: [str(v) for v in pd.unique(df[dim])] for dim in self.dimensions}
+        self.grid = grid
+        self.grid_cells = None if grid is None else self._grid_cells(df, keys)
+
+    def _grid_cells(self, df, keys):
+        frame = df[keys].copy()
+        inside = np.ones(len(df), dtype=bool)
+        for i, (col, edges) in enumerate(self.grid):
+            values = df[col].to_numpy(dtype=np.float64)
+            # Same bins as np.histogram2d: half-open, except that the last one includes its right edge
+            index = np.searchsorted(edges, values, side='right') - 1
+            index[values == edges[-1]] = len(edges) - 2
+            inside &= (index >= 0) & (index < len(edges) - 1)
+            frame[f'bin{i}'] = index
+        frame = frame[inside]
+        frame['customers'] = 1
+        cells = frame.groupby(keys + ['bin0', 'bin1'], observed=True, sort=False)['customers'].sum().reset_index()
+        for col in keys:
+            cells[col] = cells[col].astype(str)
+        return cells
+
+    @staticmethod
+    def _matching(cells, filters):
+        mask = np.ones(len(cells), dtype=bool)
+        for dim, values in (filters or {}).items():
+            mask &= cells[dim].isin([str(v) for v in values]).to_numpy()
+        return cells[mask]
+
+    def select(self, filters=None):
+        """Cells matching filters, a dict of dimension -> allowed values."""
+        return self._matching(self.cells, filters)
+
+    def grid_counts(self, filters=None):
+        """{Churn value: 2-D customer counts over the grid's bins} for the selection."""
+        cells = self._matching(self.grid_cells, filters)
+        shape = tuple(len(edges) - 1 for _, edges in self.grid)
+        counts = {}
+        for label, group in cells.groupby('Churn', sort=False):
+            grid = np.zeros(shape, dtype=np.int64)
+            np.add.at(grid, (group['bin0'].to_numpy(), group['bin1'].to_numpy()), group['customers'].to_numpy())
+            counts[label] = grid
+        return counts
+
+    def totals(self, filters=None):
+        """KPIs for the selection: customers, churn rate (%) and average monthly charge."""
+        cells = self.select(filters)
+        customers = int(cells['customers'].sum())
+        churned = int(cells['churned'].sum())
+        return {
+            'customers': customers,
+            'churned': churned,
+            'churn_rate': churned / customers * 100 if customers > 0 else 0,
+            'avg_monthly_charges': cells['monthly_charges_sum'].sum() / customers if customers > 0 else 0
+        }
+
+    def rollup(self, by, filters=None):
+        """Sums the selected cells grouped by the given columns (dimensions and/or Churn)."""
+        cells = self.select(filters)
+        return cells.groupby(list(by), sort=False)[['customers', 'churned', 'monthly_charges_sum']].sum().reset_index()
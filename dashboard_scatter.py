@@ -0,0 +1,108 @@
+import numpy as np
+import plotly.express as px
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+# Above this many rows the scatter switches to a bounded-size rendering
+DEFAULT_MAX_POINTS = 5000
+DENSITY_BINS = (36, 30)
+DENSITY_COLUMNS = ('tenure', 'MonthlyCharges')
+# Half-width given to an axis whose selected values are all equal
+FLAT_AXIS_PADDING = 0.5
+CHURN_COLORS = {'Yes': '#d62728', 'No': '#00A6FF'}
+SCATTER_TITLE = "Higher monthly charges for shorter tenures correlate with churn"
+
+
+def stratified_sample(df, max_points, seed=42):
+    """Samples up to max_points rows while keeping each Churn class's share."""
+    fraction = max_points / len(df)
+    return df.groupby('Churn', observed=True, group_keys=False).sample(frac=fraction, random_state=seed)
+
+
+def bin_edges(values, bins):
+    """bins + 1 evenly spaced edges covering values, widened when every value is the same."""
+    low, high = values.min(), values.max()
+    if low == high:
+        low, high = low - FLAT_AXIS_PADDING, high + FLAT_AXIS_PADDING
+    return np.linspace(low, high, bins + 1)
+
+
+def density_grid(df, bins=DENSITY_BINS):
+    """((column, edges), (column, edges)) binning df's tenure x MonthlyCharges plane."""
+    return tuple((col, bin_edges(df[col].to_numpy(dtype=np.float64), n)) for col, n in zip(DENSITY_COLUMNS, bins))
+
+
+def density_counts(df, grid):
+    """{Churn value: tenure x MonthlyCharges counts} of df over the grid's bins."""
+    (tenure_col, tenure_edges), (charge_col, charge_edges) = grid
+    tenure = df[tenure_col].to_numpy(dtype=np.float64)
+    charges = df[charge_col].to_numpy(dtype=np.float64)
+    churn = df['Churn'].astype(str).to_numpy()
+    return {
+        label: np.histogram2d(tenure[churn == label], charges[churn == label],
+                              bins=[tenure_edges, charge_edges])[0].astype(np.int64)
+        for label in np.unique(churn)
+    }
+
+
+def density_figure(df, bins=DENSITY_BINS):
+    """One binned tenure x MonthlyCharges heatmap per churn class, sized by bins not rows."""
+    grid = density_grid(df, bins)
+    return density_heatmaps(density_counts(df, grid), grid)
+
+
+def density_heatmaps(counts, grid):
+    """The per-class heatmaps for counts from density_counts or AggregateCube.grid_counts."""
+    # Shared edges so the two panels are directly comparable
+    (_, tenure_edges), (_, charge_edges) = grid
+    tenure_centers = np.round((tenure_edges[:-1] + tenure_edges[1:]) / 2, 1)
+    charge_centers = np.round((charge_edges[:-1] + charge_edges[1:]) / 2, 1)
+    empty = np.zeros((len(tenure_edges) - 1, len(charge_edges) - 1), dtype=np.int64)
+
+    fig = make_subplots(rows=1, cols=2, shared_yaxes=True, subplot_titles=('Churn = No', 'Churn = Yes'))
+    for col, (label, colorscale) in enumerate((('No', 'Blues'), ('Yes', 'Reds')), start=1):
+        fig.add_trace(go.Heatmap(
+            x=tenure_centers, y=charge_centers, z=counts.get(label, empty).T,
+            colorscale=colorscale, showscale=False, name=f'Churn = {label}',
+            hovertemplate='tenure %{x}<br>MonthlyCharges %{y}<br>customers %{z}<extra></extra>'
+        ), row=1, col=col)
+    fig.update_xaxes(title_text='tenure')
+    fig.update_yaxes(title_text='MonthlyCharges', row=1, col=1)
+    return fig
+
+
+def scatter_mode(rows, max_points=DEFAULT_MAX_POINTS, large_mode='density'):
+    """How a selection of rows customers is drawn: 'scatter', or large_mode above max_points."""
+    return 'scatter' if rows <= max_points else large_mode
+
+
+def binned_density_figure(counts, grid, rows):
+    """The density-mode chart from precomputed per-class counts, without touching the rows."""
+    fig = density_heatmaps(counts, grid)
+    fig.update_layout(template="plotly_dark", title=f"{SCATTER_TITLE} (binned density of {rows:,} customers)")
+    return fig
+
+
+def tenure_charges_figure(df, max_points=DEFAULT_MAX_POINTS, large_mode='density'):
+    """Builds the Monthly Charges vs. Tenure chart and returns (figure, mode used).
+
+    Up to max_points rows are drawn as a plain scatter. Larger selections are
+    drawn either as per-class density heatmaps ('density') or as a stratified
+    sample ('sample'), so the serialized figure stays bounded.
+    """
+    rows = len(df)
+    mode = scatter_mode(rows, max_points, large_mode)
+    if mode == 'density':
+        grid = density_grid(df)
+        return binned_density_figure(density_counts(df, grid), grid, rows), mode
+    if mode == 'scatter':
+        title = SCATTER_TITLE
+        fig = px.scatter(df, x='tenure', y='MonthlyCharges', color='Churn',
+                         color_discrete_map=CHURN_COLORS, template="plotly_dark")
+    else:
+        sample = stratified_sample(df, max_points)
+        title = f"{SCATTER_TITLE} (stratified sample of {len(sample):,} of {rows:,} customers)"
+        fig = px.scatter(sample, x='tenure', y='MonthlyCharges', color='Churn',
+                         color_discrete_map=CHURN_COLORS, template="plotly_dark")
+    fig.update_layout(title=title)
+    return fig, mode
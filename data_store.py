@@ -0,0 +1,207 @@
+import argparse
+import glob
+import hashlib
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from features import CATEGORICAL_FEATURES, CHARGE_COLUMNS, CHARGE_DECIMALS, FEATURE_COLUMNS, ID_COLUMN, TARGET_COLUMN, clean_raw_frame
+from file_hash import file_sha256
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:  # pragma: no cover - the store is optional, the CSV always works
+    pa = None
+    feather = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RAW_CSV_PATH = os.path.join(BASE_DIR, 'data', 'raw', 'WA_Fn-UseC_-Telco-Customer-Churn.csv')
+STORE_PATH = os.path.join(BASE_DIR, 'data', 'processed', 'telco_customers.feather')
+# Newly labeled customers, one Feather part per appended batch
+BATCH_FOLDER = os.path.join(BASE_DIR, 'data', 'processed', 'batches')
+
+# Compact dtypes for the columnar copy. tenure is int16 rather than int8 so
+# extracts with customers older than 127 months still fit.
+NUMERIC_DTYPES = {
+    'SeniorCitizen': np.int8,
+    'tenure': np.int16,
+    'MonthlyCharges': np.float32,
+    'TotalCharges': np.float32
+}
+
+
+def _source_signature(csv_path):
+    stat = os.stat(csv_path)
+    return {'source_size': str(stat.st_size), 'source_mtime_ns': str(stat.st_mtime_ns)}
+
+
+def read_raw_csv(csv_path=RAW_CSV_PATH):
+    """Parses the raw CSV and applies the typed schema used by the columnar store."""
+    df = clean_raw_frame(pd.read_csv(csv_path, dtype={'TotalCharges': str}))
+    return to_store_schema(df)
+
+
+def to_store_schema(df):
+    """Casts a cleaned Telco frame to compact dtypes and adds the Churn_numeric flag."""
+    df = df.copy()
+    for col, dtype in NUMERIC_DTYPES.items():
+        df[col] = df[col].astype(dtype)
+    for col in CATEGORICAL_FEATURES:
+        df[col] = df[col].astype('category')
+    if TARGET_COLUMN in df.columns:
+        df['Churn_numeric'] = (df[TARGET_COLUMN] == 'Yes').astype(np.int8)
+        df[TARGET_COLUMN] = df[TARGET_COLUMN].astype('category')
+    if ID_COLUMN in df.columns:
+        df[ID_COLUMN] = df[ID_COLUMN].astype(str)
+    return df.reset_index(drop=True)
+
+
+def ingest(csv_path=RAW_CSV_PATH, store_path=STORE_PATH):
+    """Writes a typed, uncompressed (memory-mappable) Feather copy of the CSV."""
+    df = read_raw_csv(csv_path)
+    write_store(df, store_path, csv_path)
+    return df
+
+
+def write_store(df, store_path=STORE_PATH, csv_path=RAW_CSV_PATH):
+    """Writes df to the Feather store, stamped with the source CSV's hash."""
+    folder = os.path.dirname(store_path)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    metadata = {}
+    if os.path.exists(csv_path):
+        metadata = {'source_sha256': file_sha256(csv_path), **_source_signature(csv_path)}
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    schema_metadata = dict(table.schema.metadata or {})
+    schema_metadata.update({k.encode(): v.encode() for k, v in metadata.items()})
+    table = table.replace_schema_metadata(schema_metadata)
+    # Write to a temp file first so readers never see a half-written store
+    tmp_path = _tmp_path(store_path)
+    feather.write_feather(table, tmp_path, compression='uncompressed')
+    os.replace(tmp_path, store_path)
+
+
+def _tmp_path(path):
+    # Unique per writer, so concurrent writers never share a half-written file
+    return f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+
+
+def _store_metadata(store_path):
+    table = feather.read_table(store_path, memory_map=True)
+    return {k.decode(): v.decode() for k, v in (table.schema.metadata or {}).items()}
+
+
+def is_store_fresh(csv_path=RAW_CSV_PATH, store_path=STORE_PATH):
+    """True when the store exists and was built from the current CSV contents."""
+    if not os.path.exists(store_path):
+        return False
+    if not os.path.exists(csv_path):
+        return True
+    metadata = _store_metadata(store_path)
+    signature = _source_signature(csv_path)
+    # Unchanged size and mtime means unchanged content; otherwise compare hashes
+    if all(metadata.get(k) == v for k, v in signature.items()):
+        return True
+    return metadata.get('source_sha256') == file_sha256(csv_path)
+
+
+def load_customers(csv_path=RAW_CSV_PATH, store_path=STORE_PATH, missing_total_charges='keep'):
+    """Loads the typed customer table, rebuilding the store when the CSV changed.
+
+    missing_total_charges is 'keep' (NaN), 'drop' (the dashboard's choice) or
+    'median' (the notebook's imputation). A store that cannot be read is
+    rebuilt; without pyarrow, or if the store cannot be written, the CSV is
+    parsed directly.
+    """
+    df = None
+    if feather is not None:
+        try:
+            if is_store_fresh(csv_path, store_path):
+                df = feather.read_table(store_path, memory_map=True).to_pandas()
+        except (OSError, ValueError, pa.ArrowException):
+            # Truncated or corrupt, e.g. by a copy interrupted mid-write
+            df = None
+        if df is None:
+            try:
+                df = ingest(csv_path, store_path)
+            except OSError:
+                df = None
+    if df is None:
+        df = read_raw_csv(csv_path)
+
+    if missing_total_charges == 'drop':
+        df = df.dropna(subset=['TotalCharges']).reset_index(drop=True)
+    elif missing_total_charges == 'median':
+        df['TotalCharges'] = df['TotalCharges'].fillna(df['TotalCharges'].median())
+    return df
+
+
+def batch_part_path(df, batch_folder=BATCH_FOLDER):
+    """Where append_batch stores df: parts are named after a hash of their rows."""
+    digest = hashlib.sha256(pd.util.hash_pandas_object(to_store_schema(df), index=False).to_numpy().tobytes())
+    return os.path.join(batch_folder, f'batch_{digest.hexdigest()[:16]}.feather')
+
+
+def append_batch(df, batch_folder=BATCH_FOLDER):
+    """Adds a labeled batch to the store as a new Feather part and returns its path.
+
+    Appending the same batch twice leaves a single copy. The base store is
+    never rewritten.
+    """
+    if feather is None:
+        raise RuntimeError('pyarrow is required to append batches to the columnar store')
+    path = batch_part_path(df, batch_folder)
+    if not os.path.exists(path):
+        if not os.path.exists(batch_folder):
+            os.makedirs(batch_folder)
+        tmp_path = _tmp_path(path)
+        table = pa.Table.from_pandas(to_store_schema(df), preserve_index=False)
+        feather.write_feather(table, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, path)
+    return path
+
+
+def batch_parts(batch_folder=BATCH_FOLDER):
+    """Paths of the appended batches, oldest first."""
+    return sorted(glob.glob(os.path.join(batch_folder, 'batch_*.feather')), key=os.path.getmtime)
+
+
+def load_batches(batch_folder=BATCH_FOLDER, parts=None):
+    """The appended batches (or the given parts) as one typed frame, or None when there are none."""
+    parts = batch_parts(batch_folder) if parts is None else parts
+    if not parts:
+        return None
+    frames = [feather.read_table(path, memory_map=True).to_pandas() for path in parts]
+    return to_store_schema(pd.concat(frames, ignore_index=True))
+
+
+def to_model_frame(df):
+    """Returns the model's feature columns with numerics restored to float64.
+
+    Scoring float32 charges directly can flip XGBoost splits that sit on
+    exact training values, so charges are rounded back to whole cents.
+    """
+    frame = df[FEATURE_COLUMNS].copy()
+    for col in NUMERIC_DTYPES:
+        frame[col] = frame[col].astype(np.float64)
+    for col in CHARGE_COLUMNS:
+        frame[col] = frame[col].round(CHARGE_DECIMALS)
+    return frame
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the typed columnar copy of the Telco dataset.')
+    parser.add_argument('--csv', default=RAW_CSV_PATH, help='Source CSV')
+    parser.add_argument('--store', default=STORE_PATH, help='Feather file to write')
+    args = parser.parse_args()
+
+    df = ingest(args.csv, args.store)
+    print(f"Wrote {len(df):,} rows to {args.store} ({df.memory_usage(deep=True).sum() / 1e6:.2f} MB in memory)")
+
+
+if __name__ == '__main__':
+    main()
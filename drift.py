@@ -0,0 +1,384 @@
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+
+from features import FIELD_OPTIONS
+from file_hash import file_sha256
+
+logger = logging.getLogger('drift')
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_REFERENCE_PATH = os.path.join(BASE_DIR, 'models', 'drift_reference.json')
+DEFAULT_LIVE_PATH = os.path.join(BASE_DIR, '.cache', 'drift_live.sqlite')
+
+# Fixed interior bin edges; every value lands in one of len(edges) + 1 bins
+# (including the under/overflow bins), so live counts line up with the reference.
+NUMERIC_EDGES = {
+    'tenure': [float(v) for v in range(6, 72, 6)],
+    'MonthlyCharges': [float(v) for v in range(20, 120, 10)],
+    'TotalCharges': [100.0, 250.0, 500.0] + [float(v) for v in range(1000, 9000, 1000)]
+}
+SCORE_EDGES = [round(v, 2) for v in np.arange(0.05, 1.0, 0.05)]
+# Values outside the app's options are pooled, so memory per field stays fixed
+OTHER_CATEGORY = '(other)'
+CODED_FIELDS = [field for field, options in FIELD_OPTIONS.items() if isinstance(options[0], int)]
+SCORE_FEATURE = 'churn_probability'
+
+# Conventional PSI cut-offs
+PSI_MODERATE = 0.1
+PSI_SIGNIFICANT = 0.25
+MIN_LIVE_ROWS = 100
+
+
+class DriftStats:
+    """Fixed-size histograms of the model inputs and scores.
+
+    Numeric fields and the churn score are counted into fixed bins (plus a
+    missing count), categorical fields into their known options plus
+    '(other)'. Updates are vectorized per batch and no rows are kept, so
+    memory does not grow with traffic.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.numeric = {field: [0] * (len(edges) + 1) for field, edges in NUMERIC_EDGES.items()}
+        self.missing = {field: 0 for field in NUMERIC_EDGES}
+        self.categorical = {
+            field: dict.fromkeys([str(v) for v in options] + [OTHER_CATEGORY], 0)
+            for field, options in FIELD_OPTIONS.items()
+        }
+        self.score = [0] * (len(SCORE_EDGES) + 1)
+
+    def update(self, frame, probabilities=None):
+        """Adds a batch of customers (and their churn probabilities) to the counts."""
+        self.rows += len(frame)
+        for field, edges in NUMERIC_EDGES.items():
+            values = np.asarray(frame[field], dtype=np.float64)
+            present = ~np.isnan(values)
+            self.missing[field] += int((~present).sum())
+            counts = np.bincount(np.searchsorted(edges, values[present], side='right'), minlength=len(edges) + 1)
+            self.numeric[field] = [a + int(b) for a, b in zip(self.numeric[field], counts)]
+        for field, counts in self.categorical.items():
+            values = np.asarray(frame[field])
+            if field in CODED_FIELDS:
+                # 0/1 flags may arrive as 1, 1.0 or True
+                values = values.astype(np.float64).astype(np.int64)
+            values, value_counts = np.unique(values.astype(str), return_counts=True)
+            for value, count in zip(values, value_counts):
+                key = value if value in counts else OTHER_CATEGORY
+                counts[key] += int(count)
+        if probabilities is not None:
+            counts = np.bincount(np.searchsorted(SCORE_EDGES, np.asarray(probabilities, dtype=np.float64),
+                                                 side='right'), minlength=len(SCORE_EDGES) + 1)
+            self.score = [a + int(b) for a, b in zip(self.score, counts)]
+
+    def buckets(self):
+        """(feature, bucket, count) triples for every non-zero count."""
+        items = [('rows', '', self.rows)]
+        for field, counts in self.numeric.items():
+            items.extend((field, str(i), c) for i, c in enumerate(counts))
+            items.append((field, 'missing', self.missing[field]))
+        for field, counts in self.categorical.items():
+            items.extend((field, value, c) for value, c in counts.items())
+        items.extend((SCORE_FEATURE, str(i), c) for i, c in enumerate(self.score))
+        return [item for item in items if item[2]]
+
+    def add_bucket(self, feature, bucket, count):
+        if feature == 'rows':
+            self.rows += count
+        elif feature == SCORE_FEATURE:
+            self.score[int(bucket)] += count
+        elif feature in self.numeric:
+            if bucket == 'missing':
+                self.missing[feature] += count
+            else:
+                self.numeric[feature][int(bucket)] += count
+        elif feature in self.categorical:
+            self.categorical[feature][bucket] += count
+
+    def to_dict(self):
+        return {
+            'rows': self.rows,
+            'numeric': {
+                field: {'edges': NUMERIC_EDGES[field], 'counts': counts, 'missing': self.missing[field]}
+                for field, counts in self.numeric.items()
+            },
+            'categorical': self.categorical,
+            'score': {'edges': SCORE_EDGES, 'counts': self.score}
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.rows = data['rows']
+        for field, hist in data['numeric'].items():
+            stats.numeric[field] = list(hist['counts'])
+            stats.missing[field] = hist['missing']
+        for field, counts in data['categorical'].items():
+            stats.categorical[field].update(counts)
+        stats.score = list(data['score']['counts'])
+        return stats
+
+
+def bin_labels(edges):
+    """Readable labels for the len(edges) + 1 bins defined by interior edges."""
+    labels = [f'< {edges[0]:g}']
+    labels += [f'{lo:g} to {hi:g}' for lo, hi in zip(edges[:-1], edges[1:])]
+    labels.append(f'>= {edges[-1]:g}')
+    return labels
+
+
+def distribution(stats, field):
+    """(bin or category labels, counts) of one field, or of the score for SCORE_FEATURE."""
+    if field == SCORE_FEATURE:
+        return bin_labels(SCORE_EDGES), list(stats.score)
+    if field in NUMERIC_EDGES:
+        return bin_labels(NUMERIC_EDGES[field]), list(stats.numeric[field])
+    return list(stats.categorical[field]), list(stats.categorical[field].values())
+
+
+def build_reference(frame, probabilities, reference_path=DEFAULT_REFERENCE_PATH, model_sha256=None):
+    """Writes the reference statistics of the training data and returns them."""
+    stats = DriftStats()
+    stats.update(frame, probabilities)
+    reference = stats.to_dict()
+    reference['created_at'] = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    reference['model_sha256'] = model_sha256
+    with open(reference_path, 'w') as f:
+        json.dump(reference, f, indent=2)
+    return reference
+
+
+def load_reference(reference_path=DEFAULT_REFERENCE_PATH):
+    with open(reference_path) as f:
+        data = json.load(f)
+    return DriftStats.from_dict(data), data
+
+
+class DriftStore:
+    """Live counts in SQLite, added to atomically by any number of processes."""
+
+    def __init__(self, path=DEFAULT_LIVE_PATH):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS counts (feature TEXT, bucket TEXT, count INTEGER, '
+                'PRIMARY KEY (feature, bucket)) WITHOUT ROWID'
+            )
+            self._conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self._conn.execute('INSERT OR IGNORE INTO meta VALUES (?, ?)', ('started_at', _now()))
+
+    def add(self, stats):
+        with self._lock, self._conn:
+            self._conn.executemany(
+                'INSERT INTO counts VALUES (?, ?, ?) '
+                'ON CONFLICT (feature, bucket) DO UPDATE SET count = count + excluded.count',
+                stats.buckets()
+            )
+
+    def load(self):
+        with self._lock:
+            rows = self._conn.execute('SELECT feature, bucket, count FROM counts').fetchall()
+            started_at = self._conn.execute("SELECT value FROM meta WHERE key = 'started_at'").fetchone()[0]
+        stats = DriftStats()
+        for feature, bucket, count in rows:
+            stats.add_bucket(feature, bucket, count)
+        return stats, started_at
+
+    def reset(self):
+        """Starts a new monitoring window."""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM counts')
+            self._conn.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', ('started_at', _now()))
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+class DriftMonitor:
+    """Accumulates live statistics in memory and adds them to the store in batches.
+
+    observe() is cheap and thread-safe; the pending counts are written when
+    flush_rows rows or flush_seconds have accumulated, and on flush(). With
+    background=True those writes run on a separate thread, so callers on a
+    latency-sensitive path never wait on the store, and failed writes are
+    logged and retried with the next flush.
+    """
+
+    def __init__(self, store_path=DEFAULT_LIVE_PATH, flush_rows=10_000, flush_seconds=30.0, background=False):
+        self.store = DriftStore(store_path)
+        self.flush_rows = flush_rows
+        self.flush_seconds = flush_seconds
+        self._pending = DriftStats()
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self._flusher = ThreadPoolExecutor(max_workers=1, thread_name_prefix='drift-flush') if background else None
+
+    def observe(self, frame, probabilities=None):
+        with self._lock:
+            self._pending.update(frame, probabilities)
+            due = (self._pending.rows >= self.flush_rows
+                   or time.monotonic() - self._last_flush >= self.flush_seconds)
+            if due:
+                # Restarts the timer so a slow write is not scheduled again by every batch
+                self._last_flush = time.monotonic()
+        if due and self._flusher is not None:
+            self._flusher.submit(self._flush_logged)
+        elif due:
+            self.flush()
+
+    def _flush_logged(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Writing drift statistics failed; the counts are kept for the next flush')
+
+    def flush(self):
+        """Adds the pending counts to the store; on failure they stay pending and the error is raised."""
+        with self._lock:
+            pending, self._pending = self._pending, DriftStats()
+            self._last_flush = time.monotonic()
+        if pending.rows:
+            try:
+                self.store.add(pending)
+            except Exception:
+                with self._lock:
+                    for item in pending.buckets():
+                        self._pending.add_bucket(*item)
+                raise
+
+
+def _proportions(counts, eps=1e-4):
+    counts = np.asarray(counts, dtype=np.float64)
+    total = counts.sum()
+    if total == 0:
+        return np.full(len(counts), 1.0 / len(counts))
+    # Floor empty bins so PSI stays finite
+    return np.maximum(counts / total, eps)
+
+
+def psi(expected_counts, actual_counts):
+    """Population stability index between two histograms with the same bins."""
+    expected = _proportions(expected_counts)
+    actual = _proportions(actual_counts)
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def ks_statistic(expected_counts, actual_counts):
+    """Largest gap between the two binned CDFs (a lower bound on the exact KS statistic)."""
+    expected = np.asarray(expected_counts, dtype=np.float64)
+    actual = np.asarray(actual_counts, dtype=np.float64)
+    if expected.sum() == 0 or actual.sum() == 0:
+        return 0.0
+    return float(np.max(np.abs(np.cumsum(expected) / expected.sum() - np.cumsum(actual) / actual.sum())))
+
+
+def _status(value, live_rows):
+    if live_rows < MIN_LIVE_ROWS:
+        return 'insufficient data'
+    if value >= PSI_SIGNIFICANT:
+        return 'significant'
+    if value >= PSI_MODERATE:
+        return 'moderate'
+    return 'stable'
+
+
+def drift_report(reference, live, started_at=None):
+    """Per-feature and score drift of live against reference, as a JSON-ready dict."""
+    features = {}
+    for field in NUMERIC_EDGES:
+        value = psi(reference.numeric[field], live.numeric[field])
+        features[field] = {
+            'type': 'numeric',
+            'psi': value,
+            'ks': ks_statistic(reference.numeric[field], live.numeric[field]),
+            'missing_rate': live.missing[field] / live.rows if live.rows else 0.0,
+            'status': _status(value, live.rows)
+        }
+    for field in FIELD_OPTIONS:
+        expected = list(reference.categorical[field].values())
+        actual = list(live.categorical[field].values())
+        value = psi(expected, actual)
+        features[field] = {
+            'type': 'categorical',
+            'psi': value,
+            'other_rate': live.categorical[field][OTHER_CATEGORY] / live.rows if live.rows else 0.0,
+            'status': _status(value, live.rows)
+        }
+    score_psi = psi(reference.score, live.score)
+    score = {
+        'psi': score_psi,
+        'ks': ks_statistic(reference.score, live.score),
+        'status': _status(score_psi, sum(live.score))
+    }
+    statuses = [f['status'] for f in features.values()] + [score['status']]
+    overall = next((s for s in ('significant', 'moderate', 'insufficient data') if s in statuses), 'stable')
+    return {
+        'generated_at': _now(),
+        'window_started_at': started_at,
+        'reference_rows': reference.rows,
+        'live_rows': live.rows,
+        'overall_status': overall,
+        'score': score,
+        'features': features
+    }
+
+
+def current_report(reference_path=DEFAULT_REFERENCE_PATH, live_path=DEFAULT_LIVE_PATH):
+    reference, _ = load_reference(reference_path)
+    live, started_at = DriftStore(live_path).load()
+    return drift_report(reference, live, started_at)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Monitor input and score drift against the training data.')
+    parser.add_argument('command', choices=['report', 'reference', 'reset'],
+                        help="'report' prints the drift report, 'reference' rebuilds the reference from the "
+                             "training split with the active model, 'reset' starts a new live window")
+    parser.add_argument('--reference', default=DEFAULT_REFERENCE_PATH, help='Reference statistics JSON')
+    parser.add_argument('--live', default=DEFAULT_LIVE_PATH, help='Live statistics store')
+    parser.add_argument('--output', help='Also write the report JSON here')
+    args = parser.parse_args()
+
+    if args.command == 'reference':
+        import joblib
+        from model_registry import resolve
+        from train import holdout_split, load_training_data
+        # The rows the model was trained on, as train.py builds the reference
+        X_train, _, _, _ = holdout_split(*load_training_data())
+        _, model_path = resolve('active')
+        pipeline = joblib.load(model_path)
+        build_reference(X_train, pipeline.predict_proba(X_train)[:, 1], args.reference, file_sha256(model_path))
+        print(f"Reference statistics for {len(X_train):,} training customers written to: {args.reference}")
+    elif args.command == 'reset':
+        DriftStore(args.live).reset()
+        print(f"Live drift window reset: {args.live}")
+    else:
+        if not os.path.exists(args.reference):
+            parser.error(f"no reference statistics at {args.reference}; "
+                         "run 'python drift.py reference' (or train.py) to build them")
+        report = current_report(args.reference, args.live)
+        text = json.dumps(report, indent=2)
+        if args.output:
+            with open(args.output, 'w') as f:
+                f.write(text)
+        print(text)
+        raise SystemExit(1 if report['overall_status'] == 'significant' else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+# Columns the model pipeline was trained on, in the order of the raw CSV
+NUMERICAL_FEATURES = ['SeniorCitizen', 'tenure', 'MonthlyCharges', 'TotalCharges']
+CATEGORICAL_FEATURES = [
+    'gender', 'Partner', 'Dependents', 'PhoneService',
+    'MultipleLines', 'InternetService', 'OnlineSecurity', 'OnlineBackup',
+    'DeviceProtection', 'TechSupport', 'StreamingTV', 'StreamingMovies',
+    'Contract', 'PaperlessBilling', 'PaymentMethod'
+]
+FEATURE_COLUMNS = [
+    'gender', 'SeniorCitizen', 'Partner', 'Dependents', 'tenure',
+    'PhoneService', 'MultipleLines', 'InternetService', 'OnlineSecurity',
+    'OnlineBackup', 'DeviceProtection', 'TechSupport', 'StreamingTV',
+    'StreamingMovies', 'Contract', 'PaperlessBilling', 'PaymentMethod',
+    'MonthlyCharges', 'TotalCharges'
+]
+# Values the app's sidebar offers for every discrete field
+FIELD_OPTIONS = {
+    'gender': ['Male', 'Female'],
+    'SeniorCitizen': [0, 1],
+    'Partner': ['Yes', 'No'],
+    'Dependents': ['Yes', 'No'],
+    'PhoneService': ['Yes', 'No'],
+    'MultipleLines': ['No', 'Yes', 'No phone service'],
+    'InternetService': ['DSL', 'Fiber optic', 'No'],
+    'OnlineSecurity': ['No', 'Yes', 'No internet service'],
+    'OnlineBackup': ['No', 'Yes', 'No internet service'],
+    'DeviceProtection': ['No', 'Yes', 'No internet service'],
+    'TechSupport': ['No', 'Yes', 'No internet service'],
+    'StreamingTV': ['No', 'Yes', 'No internet service'],
+    'StreamingMovies': ['No', 'Yes', 'No internet service'],
+    'Contract': ['Month-to-month', 'One year', 'Two year'],
+    'PaperlessBilling': ['Yes', 'No'],
+    'PaymentMethod': ['Electronic check', 'Mailed check', 'Bank transfer (automatic)', 'Credit card (automatic)']
+}
+INTERNET_ADDONS = ['OnlineSecurity', 'OnlineBackup', 'DeviceProtection', 'TechSupport', 'StreamingTV', 'StreamingMovies']
+ID_COLUMN = 'customerID'
+TARGET_COLUMN = 'Churn'
+# Charges are whole cents; rounding to them makes float32 copies score like the float64 originals
+CHARGE_COLUMNS = ['MonthlyCharges', 'TotalCharges']
+CHARGE_DECIMALS = 2
+
+# Risk tiers used by the app's prediction messages
+HIGH_RISK_THRESHOLD = 0.7
+MEDIUM_RISK_THRESHOLD = 0.4
+
+
+def clean_raw_frame(df):
+    """Applies the same cleaning as the app and notebook to a raw Telco frame."""
+    df['TotalCharges'] = pd.to_numeric(df['TotalCharges'], errors='coerce')
+    return df
+
+
+def risk_tier(probabilities):
+    """Maps churn probabilities to the High/Medium/Low tiers shown in the app."""
+    probabilities = np.asarray(probabilities)
+    return np.select(
+        [probabilities > HIGH_RISK_THRESHOLD, probabilities > MEDIUM_RISK_THRESHOLD],
+        ['High', 'Medium'],
+        default='Low'
+    )
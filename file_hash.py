@@ -0,0 +1,19 @@
+import hashlib
+
+# Standard library only, so the NumPy-only inference path can import it too
+
+
+def file_sha256(path):
+    """Hex sha256 of a file, read in 1 MiB blocks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_with_sha256(path):
+    """(bytes, hex sha256) from one read of a file, so what is loaded is what was hashed."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    return data, hashlib.sha256(data).hexdigest()
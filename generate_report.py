@@ -1,8 +1,32 @@
 from fpdf import FPDF
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date
+import glob
+import hashlib
+import io
+import json
 import os
+import threading
+import time
+from file_hash import file_sha256, read_with_sha256
+from instrumentation import timed
+# pandas, joblib, xgboost and matplotlib are imported by the steps that need
+# them, so the app can import this module without paying for them up front
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REPORT_FOLDER = os.path.join(BASE_DIR, 'reports')
+# Static chart used when matplotlib is not installed
+FEATURE_IMPORTANCE_PATH = os.path.join(REPORT_FOLDER, 'feature_importance.png')
+# Rendered charts, named after a hash of the model and data they were drawn from
+CHART_FOLDER = os.path.join(REPORT_FOLDER, '.charts')
+# Holdout metrics written by train.py next to the unregistered model
+METRICS_PATH = os.path.join(BASE_DIR, 'models', 'metrics.json')
+# Maps each generated report file to the hash of the inputs it was built from
+REPORT_MANIFEST_PATH = os.path.join(REPORT_FOLDER, '.report_cache.json')
+
+# Limits applied to the reports in the manifest whenever a new one is written
+REPORT_MAX_FILES = 10
+REPORT_MAX_AGE_DAYS = 30
 
 # Define a PDF class with Header and Footer
 class PDF(FPDF):
@@ -67,100 +91,700 @@ def add_recommendation(pdf, title, insight, action):
     pdf.multi_cell(0, 6, cleaned_action)   
     pdf.ln(5)
 
-# Main function to create the report
-def create_report_pdf():
-    """Generates the PDF report and returns its file path."""
+def add_segment_table(pdf, title, rows):
+    pdf.set_font('helvetica', 'B', 11)
+    pdf.cell(0, 7, title, 0, 1, 'L')
+    pdf.set_font('helvetica', '', 10)
+    with pdf.table(col_widths=(90, 40, 40), text_align=('LEFT', 'RIGHT', 'RIGHT'), line_height=6) as table:
+        header = table.row()
+        for text in (title, 'Customers', 'Churn rate'):
+            header.cell(text)
+        for value, customers, churn_rate in rows:
+            row = table.row()
+            row.cell(value.encode('latin-1', 'replace').decode('latin-1'))
+            row.cell(f'{customers:,}')
+            row.cell(f'{churn_rate:.1%}')
+    pdf.ln(4)
+
+# Report content. The fixed wording lives here; metrics, drivers, charts and
+# segment tables come from the active model and the data (collect_content()
+# and load_driver_analysis()). Hashing the collected content (plus the date)
+# identifies a report exactly.
+SUMMARY_TEXT = (
+    "This report outlines the development of an AI-powered churn prediction model designed to proactively identify customers at risk of leaving. "
+    "{model_sentence}\n\n"
+    "Churn is not random; it is concentrated in clear customer segments. {risk_profile} "
+    "This report provides concrete, data-driven recommendations to address these specific risk factors and improve customer retention."
+)
+MODEL_SENTENCE = "The final {model_name} model distinguishes between churning and loyal customers with {confidence} ({roc_auc:.2f} AUC)."
+NO_METRICS_SENTENCE = "No holdout evaluation was recorded for model version {model_version}, so its accuracy is not reported."
+
+DRIVERS_INTRO = "The fields below moved the model's churn predictions most across all {customers:,} customers, ranked by {measure}:"
+DRIVER_MEASURES = {
+    'contributions': "mean absolute per-customer contribution",
+    'importance': "the model's feature importance"
+}
+
+PERFORMANCE_INTRO = "The {model_name} model was selected for its predictive power.\n\nKey Metrics:"
+NO_METRICS_TEXT = "Holdout metrics are not available for model version {model_version}. Train it with train.py, or register it with its metrics, to include them."
+
+# ROC AUC grades, highest first: (lowest AUC, ability wording, confidence wording)
+AUC_GRADES = [
+    (0.9, 'Outstanding', 'a very high degree of confidence'),
+    (0.8, 'Excellent', 'a high degree of confidence'),
+    (0.7, 'Acceptable', 'a moderate degree of confidence'),
+    (0.6, 'Weak', 'limited confidence'),
+    (0.0, 'Poor', 'little more confidence than chance')
+]
+
+SEGMENTS_INTRO = "Churn rates by customer segment, computed from the current customer data:"
+
+# Segment tables in the report: (title, column, phrase describing a value's
+# customers in the summary); tenure is grouped into bands
+SEGMENT_FIELDS = [
+    ('Contract Type', 'Contract', 'on {} contracts'),
+    ('Tenure (months)', 'tenure', 'with {} months of tenure'),
+    ('Internet Service', 'InternetService', 'with {} internet service'),
+    ('Payment Method', 'PaymentMethod', 'paying by {}')
+]
+# (highest tenure in the band, label); the last band is open-ended
+TENURE_BANDS = [(12, '0-12'), (24, '13-24'), (48, '25-48'), (None, '49+')]
+
+DRIVER_CHART_FEATURES = 10
+DRIVER_TEXT_FEATURES = 5
+
+# (title, fields the play targets, action). The insight, and the order of the plays,
+# come from where those fields rank in the driver analysis and from the segment tables.
+RECOMMENDATIONS = [
+    (
+        "Launch a 'Loyalty Contract' Initiative.",
+        ['Contract'],
+        "Proactively offer a 10% discount or a free premium service (like Online Backup) to high-risk, month-to-month customers if they convert to a 1-year contract. This targets contract risk directly and increases customer 'stickiness'."
+    ),
+    (
+        "Implement a 'First 90 Days' Onboarding Program.",
+        ['tenure'],
+        "Create an automated email and SMS campaign for new customers that includes a welcome call, service usage tips, and a satisfaction survey at the 30-day mark. The goal is to address problems early and demonstrate value before they consider leaving."
+    ),
+    (
+        "Create a 'Peace of Mind' Service Bundle.",
+        ['OnlineSecurity', 'TechSupport'],
+        "Market a discounted bundle of these 'sticky' services to customers who only have a basic internet or phone plan. This increases their integration with our ecosystem and raises the switching cost."
+    ),
+    (
+        "Investigate the Fiber Optic Experience.",
+        ['InternetService'],
+        "Deploy a targeted survey to current and former fiber customers to diagnose the root cause. The issue could be related to pricing, reliability, or competitor offers. The findings should inform potential price adjustments or service improvements."
+    )
+]
+
+
+# Caches: file digests by file version, and built reports by input hash
+_file_digests = {}
+_report_cache = {}
+
+
+def _file_sha256(path):
+    """Hashes the file bytes once per (mtime, size) version of the file."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    version = (path, stat.st_mtime_ns, stat.st_size)
+    if version not in _file_digests:
+        _file_digests[version] = file_sha256(path)
+    return _file_digests[version]
+
+
+def _metrics_path(model_version, model_path):
+    from model_registry import LEGACY_VERSION, METADATA_FILE
+    if model_version == LEGACY_VERSION:
+        return METRICS_PATH
+    return os.path.join(os.path.dirname(model_path), METADATA_FILE)
+
+
+def content_key(model_version, model_path, report_date=None):
+    """Identifies the report a request will produce without collecting its content.
+
+    The content is determined by the model file, its metrics, the customer
+    data and the date; the file digests are cached per file version, so this
+    costs a few stat() calls once the files have been hashed.
+    """
+    from data_store import RAW_CSV_PATH
+    inputs = [model_version, model_path, _file_sha256(model_path),
+              _file_sha256(_metrics_path(model_version, model_path)), _file_sha256(RAW_CSV_PATH),
+              str(report_date or date.today())]
+    return hashlib.sha256(json.dumps(inputs).encode('utf-8')).hexdigest()
+
+
+def load_model_metrics(model_version, model_path):
+    """Training metrics of the model, or None when it was never evaluated.
+
+    Registered versions carry the metrics they were registered with; the
+    unregistered model uses the metrics.json that train.py wrote beside it.
+    """
+    from model_registry import LEGACY_VERSION
+    try:
+        with open(_metrics_path(model_version, model_path)) as f:
+            data = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    if model_version != LEGACY_VERSION:
+        data = data.get('metrics')
+    if not data or 'holdout' not in data:
+        return None
+    return data
+
+
+def auc_grade(roc_auc):
+    """(ability wording, confidence wording) for a ROC AUC, from AUC_GRADES."""
+    for lowest, ability, confidence in AUC_GRADES:
+        if roc_auc >= lowest:
+            return ability, confidence
+    return AUC_GRADES[-1][1:]
+
+
+def metric_points(holdout):
+    """The 'Key Metrics' bullet points for a holdout metrics dict."""
+    ability, _ = auc_grade(holdout['roc_auc'])
+    return {
+        "Accuracy:": f" {holdout['accuracy']:.1%} (Overall correct predictions).",
+        "Precision:": f" {holdout['precision']:.1%} (When we predict a customer will churn, we are correct {holdout['precision']:.1%} of the time).",
+        "Recall:": f" {holdout['recall']:.1%} (The model successfully identifies {holdout['recall']:.1%} of all customers who are actually going to churn).",
+        "ROC AUC Score:": f" {holdout['roc_auc']:.3f} ({ability} ability to distinguish between churners and non-churners)."
+    }
+
+
+def _tenure_band(tenure):
+    for high, label in TENURE_BANDS:
+        if high is None or tenure <= high:
+            return label
+
+
+def segment_tables(df):
+    """{segment title: rows of [value, customers, churn rate]}, highest churn first."""
+    tables = {}
+    for title, column, _ in SEGMENT_FIELDS:
+        if column == 'tenure':
+            keys = df['tenure'].map(_tenure_band)
+        else:
+            keys = df[column].astype(str)
+        grouped = df['Churn_numeric'].groupby(keys, observed=True).agg(['count', 'mean'])
+        grouped = grouped.sort_values('mean', ascending=False, kind='stable')
+        tables[title] = [[str(value), int(row['count']), round(float(row['mean']), 4)]
+                         for value, row in grouped.iterrows()]
+    return tables
+
+
+def risk_profile(segments):
+    """Summary sentence naming the highest-churn value of every segment table."""
+    parts = []
+    for title, _, phrase in SEGMENT_FIELDS:
+        rows = segments.get(title)
+        if rows:
+            value, _, churn_rate = rows[0]
+            parts.append(f"{phrase.format(value)} ({churn_rate:.1%})")
+    if not parts:
+        return ''
+    return f"The highest churn rates are among customers {_listed(parts)}."
+
+
+def _listed(parts):
+    return parts[0] if len(parts) == 1 else f"{', '.join(parts[:-1])} and {parts[-1]}"
+
+
+def recommendations(analysis, content):
+    """(title, insight, action) for every RECOMMENDATIONS play, strongest driver first.
+
+    Each insight states where the play's fields rank in the driver analysis
+    and, when a segment table covers the field, the churn rate of its
+    riskiest segment against the overall rate.
+    """
+    ranks = {driver['field']: (rank, driver) for rank, driver in enumerate(analysis['drivers'], start=1)}
+    segments = {column: (title, phrase) for title, column, phrase in SEGMENT_FIELDS}
+    plays = sorted(RECOMMENDATIONS, key=lambda play: min(ranks[field][0] for field in play[1]))
+    result = []
+    for number, (title, fields, action) in enumerate(plays, start=1):
+        found = [ranks[field] for field in fields]
+        insight = (f"{_listed(fields)} {'ranks' if len(fields) == 1 else 'rank'} "
+                   f"{_listed([f'#{rank}' for rank, _ in found])} of {len(ranks)} fields in the driver analysis "
+                   f"({_listed([format(driver['share'], '.0%') for _, driver in found])} of the model's attribution).")
+        for field, (_, driver) in zip(fields, found):
+            rows = content['segments'].get(segments[field][0]) if field in segments else None
+            if rows:
+                value, _, churn_rate = rows[0]
+                insight += (f" Customers {segments[field][1].format(value)} churn at {churn_rate:.1%}, "
+                            f"against {content['churn_rate']:.1%} overall.")
+            elif driver['riskiest'] is not None:
+                insight += f" '{driver['riskiest']}' is the {field} value that pushes customers furthest toward churn."
+        result.append((f"{number}. {title}", insight, action))
+    return result
+
+
+def chart_path(name, *inputs):
+    """Where a chart drawn from the given inputs is cached."""
+    digest = hashlib.sha256(json.dumps([name, *inputs]).encode('utf-8')).hexdigest()[:16]
+    return os.path.join(CHART_FOLDER, f'{name}_{digest}.png')
+
+
+def collect_content(model_version=None, model_path=None):
+    """Everything the report shows apart from the static text, as JSON-friendly data.
+
+    Reads the model's metrics and computes the segment tables from the
+    customer data. Charts and the driver analysis are referenced by their
+    cache paths, which are derived from the model and data hashes, so no
+    model work is done here.
+    """
+    from data_store import RAW_CSV_PATH, load_customers
+    from model_registry import resolve
+    if model_path is None:
+        model_version, model_path = resolve('active')
+
+    metrics = load_model_metrics(model_version, model_path)
+    # Without recorded metrics the report says so rather than quoting another model's figures
+    model_name, holdout, evaluation = None, None, None
+    if metrics is not None:
+        model_name, holdout = metrics['selected_model'], metrics['holdout']
+        evaluation = f"{metrics['n_test']:,} held-out customers" if 'n_test' in metrics else 'the holdout set'
+        if 'trained_at' in metrics:
+            evaluation += f", trained {metrics['trained_at']}"
+
+    model_sha256 = _file_sha256(model_path)
+    data_sha256 = _file_sha256(RAW_CSV_PATH)
+    df = load_customers()
+    driver_chart = chart_path('drivers', model_sha256, data_sha256, DRIVER_CHART_FEATURES)
+    return {
+        'model_version': model_version,
+        'model_path': model_path,
+        'model_sha256': model_sha256,
+        'data_sha256': data_sha256,
+        'model_name': model_name,
+        'roc_auc': holdout['roc_auc'] if holdout else None,
+        'metrics': metric_points(holdout) if holdout else None,
+        'evaluation': evaluation,
+        'segments': segment_tables(df),
+        'customers': int(len(df)),
+        'churn_rate': round(float(df['Churn_numeric'].mean()), 4),
+        'driver_chart': driver_chart,
+        'driver_data': os.path.splitext(driver_chart)[0] + '.json',
+        'segment_chart': chart_path('segments', data_sha256)
+    }
+
+
+def driver_analysis(pipeline, frame):
+    """The fields ranked by how much they move the model's predictions over frame.
+
+    XGBoost models use the per-customer contributions the app explains
+    predictions with: each field's score is its mean absolute contribution,
+    plus the category (or direction, for numerics) that raises churn risk
+    most. Other estimators fall back to their built-in feature importances
+    (or coefficient sizes), summed over each field's columns. Returns
+    {'method': 'contributions' or 'importance', 'drivers': [...]}, highest
+    score first.
+    """
+    import numpy as np
+    import pandas as pd
+    from explain import BIAS_COLUMN, TreeExplainer, field_indicator
+    from features import FEATURE_COLUMNS, NUMERICAL_FEATURES
+    classifier = pipeline.named_steps['classifier']
+    contributions = None
+    if hasattr(classifier, 'get_booster'):
+        contributions = TreeExplainer(pipeline).contributions(frame)[:, :BIAS_COLUMN]
+        scores = np.abs(contributions).mean(axis=0)
+    else:
+        if hasattr(classifier, 'feature_importances_'):
+            encoded = classifier.feature_importances_
+        else:
+            encoded = np.abs(classifier.coef_[0])
+        scores = encoded @ field_indicator(pipeline.named_steps['preprocessor'])
+
+    total = float(scores.sum()) or 1.0
+    drivers = []
+    for i, field in enumerate(FEATURE_COLUMNS):
+        driver = {'field': field, 'score': float(scores[i]), 'share': float(scores[i]) / total,
+                  'riskiest': None, 'riskiest_contribution': None, 'direction': None}
+        if contributions is not None and field in NUMERICAL_FEATURES:
+            values = frame[field].to_numpy(dtype=np.float64)
+            known = ~np.isnan(values)
+            values, field_contributions = values[known], contributions[known, i]
+            if values.std() > 0 and field_contributions.std() > 0:
+                driver['direction'] = 'higher' if np.corrcoef(values, field_contributions)[0, 1] > 0 else 'lower'
+        elif contributions is not None:
+            means = pd.Series(contributions[:, i]).groupby(frame[field].astype(str).to_numpy()).mean()
+            driver['riskiest'] = str(means.idxmax())
+            driver['riskiest_contribution'] = float(means.max())
+        drivers.append(driver)
+    drivers.sort(key=lambda d: d['score'], reverse=True)
+    return {'method': 'contributions' if contributions is not None else 'importance', 'drivers': drivers}
+
+
+def driver_points(analysis, count=DRIVER_TEXT_FEATURES):
+    """Bullet points describing the top drivers of a driver analysis."""
+    points = {}
+    for rank, driver in enumerate(analysis['drivers'][:count], start=1):
+        text = f" {driver['share']:.0%} of the model's total attribution."
+        if driver['direction'] is not None:
+            text += f" {driver['direction'].capitalize()} values raise churn risk."
+        elif driver['riskiest'] is not None:
+            text += (f" '{driver['riskiest']}' pushes customers furthest toward churn"
+                     f" ({driver['riskiest_contribution']:+.2f} log-odds on average).")
+        points[f"{rank}. {driver['field']}:"] = text
+    return points
+
+
+def _prune_older(path):
+    """Removes earlier cached versions of the file at path (same name prefix and extension)."""
+    stem, ext = os.path.splitext(os.path.basename(path))
+    prefix = stem.rsplit('_', 1)[0]
+    for old in glob.glob(os.path.join(os.path.dirname(path), f'{prefix}_*{ext}')):
+        if old != path:
+            os.remove(old)
+
+
+def load_driver_analysis(content, load_pipeline=None):
+    """The driver analysis for the content's model and data, computed once and cached next to the chart.
+
+    The analysis needs a full pass of per-customer contributions, so it is
+    written to content['driver_data'] and reused until the model or data changes.
+    load_pipeline returns an already loaded (pipeline, sha256 of its file); it
+    is only used when that hash is the content's, otherwise the model is loaded
+    from the bytes that hash to content['model_sha256'].
+    """
+    path = content['driver_data']
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        pass
+    from data_store import load_customers, to_model_frame
+    pipeline, model_sha256 = load_pipeline() if load_pipeline is not None else (None, None)
+    if model_sha256 != content['model_sha256']:
+        import joblib
+        data, model_sha256 = read_with_sha256(content['model_path'])
+        if model_sha256 != content['model_sha256']:
+            raise RuntimeError('The model file changed while the report was being built; generate it again.')
+        pipeline = joblib.load(io.BytesIO(data))
+    analysis = driver_analysis(pipeline, to_model_frame(load_customers()))
+    folder = os.path.dirname(path)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(analysis, f, indent=2)
+    os.replace(tmp_path, path)
+    _prune_older(path)
+    return analysis
+
+
+def _save_chart(fig, path):
+    """Writes a figure to the chart cache, replacing older renders of the same chart."""
+    folder = os.path.dirname(path)
+    if not os.path.exists(folder):
+        os.makedirs(folder)
+    tmp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    fig.savefig(tmp_path, format='png', dpi=150, bbox_inches='tight')
+    os.replace(tmp_path, path)
+    _prune_older(path)
+
+
+def render_driver_chart(content, analysis):
+    """Draws the model's top churn drivers unless the chart for this model and data is cached."""
+    path = content['driver_chart']
+    if os.path.exists(path):
+        return path
+    # The object-oriented API (no pyplot) is safe to use off the main thread
+    from matplotlib.figure import Figure
+    top = analysis['drivers'][:DRIVER_CHART_FEATURES]
+
+    fig = Figure(figsize=(8, 4.5))
+    ax = fig.subplots()
+    ax.barh([d['field'] for d in reversed(top)], [d['score'] for d in reversed(top)], color='#164D81')
+    ax.set_xlabel('mean |contribution| (log-odds)' if analysis['method'] == 'contributions' else 'feature importance')
+    ax.set_title(f"Top {len(top)} churn drivers (model {content['model_version']})")
+    _save_chart(fig, path)
+    return path
+
+
+def render_segment_chart(content):
+    """Draws churn rate by contract type and tenure band unless the chart for this data is cached."""
+    path = content['segment_chart']
+    if os.path.exists(path):
+        return path
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=(8, 3.5))
+    axes = fig.subplots(1, 2)
+    for ax, title in zip(axes, ('Contract Type', 'Tenure (months)')):
+        rows = content['segments'][title]
+        if title == 'Tenure (months)':
+            # Bands read better in time order than by churn rate
+            order = [label for _, label in TENURE_BANDS]
+            rows = sorted(rows, key=lambda row: order.index(row[0]))
+        ax.bar([row[0] for row in rows], [row[2] * 100 for row in rows], color='#D62728')
+        ax.set_title(f'Churn rate by {title.lower()}')
+        ax.set_ylabel('churn %')
+        ax.tick_params(axis='x', labelsize=8)
+    fig.tight_layout()
+    _save_chart(fig, path)
+    return path
+
+
+def render_charts(content, analysis, progress=None):
+    """Renders (or finds in the cache) both charts; returns {'drivers': path, 'segments': path}.
+
+    Without matplotlib the static feature importance image stands in for the
+    driver chart and the segment chart is left out.
+    """
+    try:
+        import matplotlib  # noqa: F401
+    except ImportError:
+        return {'drivers': FEATURE_IMPORTANCE_PATH, 'segments': None}
+    if progress is not None:
+        progress(0.6, 'Rendering driver chart')
+    drivers = render_driver_chart(content, analysis)
+    if progress is not None:
+        progress(0.75, 'Rendering segment chart')
+    return {'drivers': drivers, 'segments': render_segment_chart(content)}
+
+
+def report_cache_key(content, report_date=None):
+    """Hash of everything that ends up in the PDF: text, collected content and date.
+
+    The chart and driver analysis paths in content already encode the model
+    and data they are computed from.
+    """
+    inputs = {
+        'summary': [SUMMARY_TEXT, MODEL_SENTENCE, NO_METRICS_SENTENCE, AUC_GRADES, SEGMENT_FIELDS],
+        'drivers_intro': [DRIVERS_INTRO, DRIVER_MEASURES, DRIVER_TEXT_FEATURES],
+        'performance_intro': [PERFORMANCE_INTRO, NO_METRICS_TEXT],
+        'segments_intro': SEGMENTS_INTRO,
+        'recommendations': RECOMMENDATIONS,
+        'content': content,
+        'feature_importance_sha256': _file_sha256(FEATURE_IMPORTANCE_PATH),
+        'date': str(report_date or date.today())
+    }
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def _read_manifest():
+    try:
+        with open(REPORT_MANIFEST_PATH) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_manifest(manifest):
+    with open(REPORT_MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+
+
+def prune_reports(keep_path=None, max_files=REPORT_MAX_FILES, max_age_days=REPORT_MAX_AGE_DAYS):
+    """Deletes generated reports older than max_age_days, then the oldest beyond max_files.
+
+    Only files listed in the manifest are candidates, so reports this cache
+    did not write (such as the one checked into the repository) are never
+    touched.
+    """
+    manifest = _read_manifest()
+    paths = [os.path.join(REPORT_FOLDER, name) for name in manifest]
+    reports = sorted(filter(os.path.exists, paths), key=os.path.getmtime, reverse=True)
+    cutoff = time.time() - max_age_days * 86400
+    removed = []
+    for i, path in enumerate(reports):
+        if path == keep_path:
+            continue
+        if i >= max_files or os.path.getmtime(path) < cutoff:
+            os.remove(path)
+            removed.append(os.path.basename(path))
+
+    # Entries whose file is already gone are dropped too
+    stale = [name for name in manifest if name in removed or not os.path.exists(os.path.join(REPORT_FOLDER, name))]
+    if stale:
+        for name in stale:
+            manifest.pop(name)
+        _write_manifest(manifest)
+    return removed
+
+
+def summary_text(content):
+    """The executive summary, worded from the model's metrics and the segment tables."""
+    if content['metrics'] is None:
+        model_sentence = NO_METRICS_SENTENCE.format(model_version=content['model_version'])
+    else:
+        _, confidence = auc_grade(content['roc_auc'])
+        model_sentence = MODEL_SENTENCE.format(model_name=content['model_name'], confidence=confidence,
+                                               roc_auc=content['roc_auc'])
+    return SUMMARY_TEXT.format(model_sentence=model_sentence, risk_profile=risk_profile(content['segments']))
+
+
+def build_report_pdf(report_path, content, charts, analysis):
+    """Renders the PDF from the fixed wording, collected content, driver analysis and chart images."""
     pdf = PDF()
     pdf.add_page()
     
     # 1. Executive Summary
     add_title(pdf, '1. Executive Summary')
-    summary_text = (
-        "This report outlines the development of an AI-powered churn prediction model designed to proactively identify customers at risk of leaving. "
-        "The final model, an XGBoost Classifier, can distinguish between churning and loyal customers with a high degree of confidence (0.83 AUC).\n\n"
-        "Our analysis reveals that churn is not random; it is driven by a clear set of factors. The highest risk profile is a new customer on a flexible month-to-month contract, who is paying a relatively high monthly fee and has not subscribed to value-added 'sticky' services like Tech Support or Online Security. "
-        "This report provides concrete, data-driven recommendations to address these specific risk factors and improve customer retention."
-    )
-    add_body_text(pdf, summary_text)
+    add_body_text(pdf, summary_text(content))
 
     # 2. Key Drivers of Customer Churn
     add_title(pdf, '2. Key Drivers of Customer Churn')
-    add_body_text(pdf, "The predictive model identified the most influential factors in a customer's decision to churn. These drivers can be grouped into three strategic themes:")
+    add_body_text(pdf, DRIVERS_INTRO.format(customers=content['customers'],
+                                            measure=DRIVER_MEASURES[analysis['method']]))
     
-    feature_importance_path = os.path.join(BASE_DIR, 'reports', 'feature_importance.png')
-    if os.path.exists(feature_importance_path):
-        pdf.image(feature_importance_path, x=(210-160)/2, w=160)
+    if charts['drivers'] and os.path.exists(charts['drivers']):
+        pdf.image(charts['drivers'], x=(210-160)/2, w=160)
         pdf.ln(5)
     else:
-        add_body_text(pdf, f"[Image not found at '{feature_importance_path}']")
+        add_body_text(pdf, f"[Image not found at '{charts['drivers']}']")
     
-    add_tiered_insight(pdf, "Tier 1: Financial & Loyalty Core", {
-        "TotalCharges & tenure:": " The customer's financial lifetime value and length of service are the strongest indicators of loyalty. New customers are the most vulnerable.",
-        "MonthlyCharges:": " High monthly fees, especially for new customers, significantly increase churn risk."
-    })
-    
-    add_tiered_insight(pdf, "Tier 2: Contractual & Service Red Flags", {
-        "Contract_Month-to-month:": " The lack of a long-term commitment is the single largest risk factor, providing an easy exit path for dissatisfied customers.",
-        "InternetService_Fiber optic:": " This premium service is paradoxically linked to higher churn, suggesting potential issues with its price, performance, or customer support."
-    })
-
-    add_tiered_insight(pdf, "Tier 3: Ecosystem 'Stickiness' Factors", {
-        "Absence of Add-ons:": " Customers without services like Online Security, Tech Support, and Online Backup are less integrated into our platform and have fewer reasons to stay."
-    })
+    add_tiered_insight(pdf, "", driver_points(analysis))
 
     pdf.add_page()
 
     # 3. Predictive Model Performance
     add_title(pdf, '3. Predictive Model Performance')
-    add_body_text(pdf, "An XGBoost model was selected for its superior predictive power. It provides a strong balance between identifying potential churners and avoiding false alarms.\n\nKey Metrics:")
-    
-    add_tiered_insight(pdf, "", {
-        "Accuracy:": " 79.1% (Overall correct predictions).",
-        "Precision:": " 63.4% (When we predict a customer will churn, we are correct 63.4% of the time).",
-        "Recall:": " 49.5% (The model successfully identifies 49.5% of all customers who are actually going to churn).",
-        "ROC AUC Score:": " 0.826 (Excellent ability to distinguish between churners and non-churners)."
-    })
+    if content['metrics'] is None:
+        add_body_text(pdf, NO_METRICS_TEXT.format(model_version=content['model_version']))
+    else:
+        add_body_text(pdf, PERFORMANCE_INTRO.format(model_name=content['model_name']))
+        add_tiered_insight(pdf, "", content['metrics'])
+        add_body_text(pdf, f"Model version {content['model_version']}; evaluated on {content['evaluation']}.")
     
     pdf.ln(5)
 
-    # 4. Actionable Recommendations
-    add_title(pdf, '4. Actionable Business Recommendations')
-    
-    add_recommendation(
-        pdf, "1. Launch a 'Loyalty Contract' Initiative.",
-        "Month-to-month contracts are the biggest churn driver.",
-        "Proactively offer a 10% discount or a free premium service (like Online Backup) to high-risk, month-to-month customers if they convert to a 1-year contract. This directly addresses the main risk factor and increases customer 'stickiness'."
-    )
-    
-    add_recommendation(
-        pdf, "2. Implement a 'First 90 Days' Onboarding Program.",
-        "Low tenure is the second-largest predictor of churn.",
-        "Create an automated email and SMS campaign for new customers that includes a welcome call, service usage tips, and a satisfaction survey at the 30-day mark. The goal is to address problems early and demonstrate value before they consider leaving."
-    )
+    # 4. Churn by Customer Segment
+    add_title(pdf, '4. Churn by Customer Segment')
+    add_body_text(pdf, f"{SEGMENTS_INTRO} {content['customers']:,} customers, {content['churn_rate']:.1%} of whom churned.")
+    if charts['segments']:
+        pdf.image(charts['segments'], x=(210-170)/2, w=170)
+        pdf.ln(5)
+    for title, rows in content['segments'].items():
+        add_segment_table(pdf, title, rows)
 
-    add_recommendation(
-        pdf, "3. Create a 'Peace of Mind' Service Bundle.",
-        "Lack of add-on services like Tech Support and Online Security correlates with higher churn.",
-        "Market a discounted bundle of these 'sticky' services to customers who only have a basic internet or phone plan. This increases their integration with our ecosystem and raises the switching cost."
-    )
-    
-    add_recommendation(
-        pdf, "4. Investigate the Fiber Optic Experience.",
-        "Fiber optic customers, despite being on a premium plan, are a high-churn segment.",
-        "Deploy a targeted survey to current and former fiber customers to diagnose the root cause. The issue could be related to pricing, reliability, or competitor offers. The findings should inform potential price adjustments or service improvements."
-    )
+    pdf.add_page()
+
+    # 5. Actionable Recommendations
+    add_title(pdf, '5. Actionable Business Recommendations')
     
-    # Save the PDF 
-    report_folder = os.path.join(BASE_DIR, 'reports')
-    if not os.path.exists(report_folder):
-        os.makedirs(report_folder)
+    for title, insight, action in recommendations(analysis, content):
+        add_recommendation(pdf, title, insight, action)
     
-    report_filename = f'Churn_Prediction_Report_{date.today()}.pdf'
-    report_path = os.path.join(report_folder, report_filename)
     pdf.output(report_path)
     print(f"Report successfully generated: {report_path}")
     return report_path
 
+
+def get_report_pdf(force=False, model_version=None, model_path=None, load_pipeline=None, progress=None):
+    """Returns (report_path, pdf_bytes), rebuilding the PDF only when its inputs changed.
+
+    Unchanged reports are served from memory, or from the file on disk after
+    a restart, so repeating a request does no PDF work and no disk writes.
+    Charts and the driver analysis are cached separately, so a new model
+    only recomputes the drivers and redraws their chart. load_pipeline returns the already loaded (model, sha256 of its
+    file), if the caller has one; progress(fraction, message) is called as the work advances.
+    """
+    if progress is not None:
+        progress(0.05, 'Collecting metrics and segment tables')
+    with timed('report.collect'):
+        content = collect_content(model_version, model_path)
+    key = report_cache_key(content)
+    if not force and key in _report_cache:
+        return _report_cache[key]
+
+    if not os.path.exists(REPORT_FOLDER):
+        os.makedirs(REPORT_FOLDER)
+    report_filename = f'Churn_Prediction_Report_{date.today()}.pdf'
+    report_path = os.path.join(REPORT_FOLDER, report_filename)
+
+    manifest = _read_manifest()
+    if force or manifest.get(report_filename) != key or not os.path.exists(report_path):
+        if progress is not None:
+            progress(0.15, 'Ranking churn drivers')
+        with timed('report.drivers'):
+            analysis = load_driver_analysis(content, load_pipeline)
+        with timed('report.charts'):
+            charts = render_charts(content, analysis, progress)
+        if progress is not None:
+            progress(0.9, 'Writing PDF')
+        with timed('report.pdf'):
+            build_report_pdf(report_path, content, charts, analysis)
+        manifest[report_filename] = key
+        _write_manifest(manifest)
+        prune_reports(keep_path=report_path)
+
+    with open(report_path, 'rb') as f:
+        pdf_bytes = f.read()
+    # Only the current report is kept in memory
+    _report_cache.clear()
+    _report_cache[key] = (report_path, pdf_bytes)
+    return _report_cache[key]
+
+
+class ReportJob:
+    """One background report build: its future plus the latest progress update."""
+
+    def __init__(self):
+        self.fraction = 0.0
+        self.message = 'Queued'
+        self.started_at = time.time()
+        self.future = None
+
+    def update(self, fraction, message):
+        self.fraction = fraction
+        self.message = message
+
+    def done(self):
+        return self.future.done()
+
+    def result(self):
+        """(report_path, pdf_bytes); re-raises the build's exception if it failed."""
+        return self.future.result()
+
+
+class ReportWorker:
+    """Builds reports on a background thread so callers never wait on PDF work.
+
+    Requests for the same report (same content_key) made while it is being
+    built share that build; requests for a different model or data queue
+    their own.
+    """
+
+    def __init__(self):
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='report-builder')
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def _run(self, job, kwargs):
+        with timed('report.total'):
+            result = get_report_pdf(progress=job.update, **kwargs)
+        job.update(1.0, 'Done')
+        return result
+
+    def submit(self, force=False, model_version=None, model_path=None, load_pipeline=None):
+        """Starts a build, or returns the unfinished one for the same report."""
+        if model_path is None:
+            from model_registry import resolve
+            model_version, model_path = resolve('active')
+        key = content_key(model_version, model_path)
+        with self._lock:
+            # Finished builds are forgotten; their result is in the report cache
+            self._jobs = {k: job for k, job in self._jobs.items() if not job.done()}
+            if key in self._jobs:
+                return self._jobs[key]
+            job = ReportJob()
+            job.future = self._executor.submit(self._run, job, {
+                'force': force, 'model_version': model_version, 'model_path': model_path,
+                'load_pipeline': load_pipeline
+            })
+            self._jobs[key] = job
+            return job
+
+
+# Main function to create the report
+def create_report_pdf(force=False):
+    """Generates the PDF report (if its inputs changed) and returns its file path."""
+    return get_report_pdf(force)[0]
+
  
 if __name__ == '__main__':
-    create_report_pdf()
\ No newline at end of file
+    create_report_pdf(force=True)
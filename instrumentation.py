@@ -0,0 +1,332 @@
+import atexit
+import functools
+import os
+import sys
+import threading
+import time
+from bisect import bisect_left
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+# Standard library only, so every module on a hot path can import this for free
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+METRIC_PREFIX = 'churn'
+# Upper bounds of the histogram buckets; values above the last go to +Inf
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BATCH_SIZE_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096, 16384, 65536)
+
+# Setting CHURN_PROFILE (to a folder, or to 1 for the default one) turns on the sampling profiler
+PROFILE_ENV = 'CHURN_PROFILE'
+PROFILE_INTERVAL_ENV = 'CHURN_PROFILE_INTERVAL_MS'
+DEFAULT_PROFILE_DIR = os.path.join(BASE_DIR, '.cache', 'profiles')
+DEFAULT_PROFILE_INTERVAL_MS = 10
+PROFILE_FLUSH_SECONDS = 30
+
+
+class Histogram:
+    """Bucket counts, sum and count in the Prometheus histogram layout."""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th quantile (the maximum for the last bucket)."""
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+
+class Metrics:
+    """Process-wide stage latencies, cache hit/miss counters and model batch sizes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+        self.batches = {}
+        self.cache = Counter()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            if stage not in self.stages:
+                self.stages[stage] = Histogram(LATENCY_BUCKETS)
+            self.stages[stage].observe(seconds)
+
+    def record_batch(self, model, rows):
+        with self._lock:
+            if model not in self.batches:
+                self.batches[model] = Histogram(BATCH_SIZE_BUCKETS)
+            self.batches[model].observe(rows)
+
+    def record_cache(self, name, hits=0, misses=0):
+        with self._lock:
+            self.cache[(name, 'hit')] += hits
+            self.cache[(name, 'miss')] += misses
+
+    def record_call(self, name):
+        """A call through a cache that only reports its misses (see track_cache)."""
+        with self._lock:
+            self.cache[(name, 'call')] += 1
+
+    def reset(self):
+        with self._lock:
+            self.stages.clear()
+            self.batches.clear()
+            self.cache.clear()
+
+
+METRICS = Metrics()
+
+
+def observe(stage, seconds):
+    METRICS.observe(stage, seconds)
+
+
+def record_batch(model, rows):
+    """Records the number of rows in one model call."""
+    METRICS.record_batch(model, rows)
+
+
+def record_cache(name, hits=0, misses=0):
+    METRICS.record_cache(name, hits, misses)
+
+
+def reset():
+    METRICS.reset()
+
+
+@contextmanager
+def timed(stage):
+    """Adds the wall-clock time of the block (or decorated function) to the stage's histogram."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        METRICS.observe(stage, time.perf_counter() - start)
+
+
+def track_cache(name, cache):
+    """Wraps a Streamlit cache decorator so its hits and misses are counted.
+
+    Use as @track_cache('dashboard.load_data', st.cache_data). The function
+    body only runs on a miss, so calls that do not reach it are hits; misses
+    are also timed under '<name>.compute'. clear() is passed through.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def compute(*args, **kwargs):
+            METRICS.record_cache(name, misses=1)
+            with timed(f'{name}.compute'):
+                return fn(*args, **kwargs)
+
+        cached = cache(compute)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            METRICS.record_call(name)
+            return cached(*args, **kwargs)
+
+        wrapper.clear = cached.clear
+        return wrapper
+    return decorate
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def stage_rows():
+    """One row per stage: calls, mean and approximate p50/p95 (bucket upper bounds) in ms."""
+    with METRICS._lock:
+        return [
+            {
+                'Stage': stage,
+                'Calls': hist.count,
+                'Mean (ms)': _ms(hist.sum / hist.count),
+                'p50 (ms)': _ms(hist.quantile(0.5)),
+                'p95 (ms)': _ms(hist.quantile(0.95)),
+                'Max (ms)': _ms(hist.max)
+            }
+            for stage, hist in sorted(METRICS.stages.items())
+        ]
+
+
+def cache_counts():
+    """{cache name: (hits, misses)}; Streamlit caches count calls that never reached the body as hits."""
+    with METRICS._lock:
+        counts = dict(METRICS.cache)
+    names = sorted({name for name, _ in counts})
+    result = {}
+    for name in names:
+        misses = counts.get((name, 'miss'), 0)
+        hits = counts.get((name, 'hit'), 0)
+        if (name, 'call') in counts:
+            hits += counts[(name, 'call')] - misses
+        result[name] = (hits, misses)
+    return result
+
+
+def cache_rows():
+    rows = []
+    for name, (hits, misses) in cache_counts().items():
+        lookups = hits + misses
+        rows.append({'Cache': name, 'Hits': hits, 'Misses': misses,
+                     'Hit rate': round(hits / lookups, 4) if lookups else None})
+    return rows
+
+
+def batch_rows():
+    with METRICS._lock:
+        return [
+            {
+                'Model call': model,
+                'Calls': hist.count,
+                'Mean rows': round(hist.sum / hist.count, 1),
+                'p50 rows': hist.quantile(0.5),
+                'Max rows': int(hist.max)
+            }
+            for model, hist in sorted(METRICS.batches.items())
+        ]
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram_lines(metric, label, items):
+    lines = []
+    for key, hist in items:
+        cumulative = 0
+        for bound, count in zip(hist.buckets + ('+Inf',), hist.counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{{{label}="{_label(key)}",le="{bound}"}} {cumulative}')
+        lines.append(f'{metric}_sum{{{label}="{_label(key)}"}} {hist.sum:.6f}')
+        lines.append(f'{metric}_count{{{label}="{_label(key)}"}} {hist.count}')
+    return lines
+
+
+def prometheus_text():
+    """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+    caches = cache_counts()
+    lines = [
+        f'# HELP {METRIC_PREFIX}_stage_seconds Wall-clock time of instrumented stages.',
+        f'# TYPE {METRIC_PREFIX}_stage_seconds histogram'
+    ]
+    with METRICS._lock:
+        lines += _histogram_lines(f'{METRIC_PREFIX}_stage_seconds', 'stage', sorted(METRICS.stages.items()))
+        batch_lines = _histogram_lines(f'{METRIC_PREFIX}_model_batch_rows', 'model', sorted(METRICS.batches.items()))
+    lines += [
+        f'# HELP {METRIC_PREFIX}_cache_requests_total Cache lookups by result.',
+        f'# TYPE {METRIC_PREFIX}_cache_requests_total counter'
+    ]
+    for name, (hits, misses) in caches.items():
+        lines.append(f'{METRIC_PREFIX}_cache_requests_total{{cache="{_label(name)}",result="hit"}} {hits}')
+        lines.append(f'{METRIC_PREFIX}_cache_requests_total{{cache="{_label(name)}",result="miss"}} {misses}')
+    lines += [
+        f'# HELP {METRIC_PREFIX}_model_batch_rows Rows per model call.',
+        f'# TYPE {METRIC_PREFIX}_model_batch_rows histogram'
+    ]
+    lines += batch_lines
+    return '\n'.join(lines) + '\n'
+
+
+class SamplingProfiler:
+    """Samples every thread's Python stack at a fixed interval and writes folded stacks to disk.
+
+    The output is the 'folded' format read by flamegraph.pl and speedscope:
+    one line per distinct stack, frames joined by ';', then the sample count.
+    The file is rewritten every PROFILE_FLUSH_SECONDS and at exit.
+    """
+
+    def __init__(self, folder=DEFAULT_PROFILE_DIR, interval_ms=DEFAULT_PROFILE_INTERVAL_MS):
+        self.folder = folder
+        self.interval = interval_ms / 1000
+        self.path = os.path.join(folder, f"profile-{os.getpid()}-{datetime.now():%Y%m%dT%H%M%S}.folded")
+        self.samples = 0
+        self._stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+
+    def start(self):
+        if not os.path.exists(self.folder):
+            os.makedirs(self.folder)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def _sample(self):
+        own = threading.get_ident()
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            self._stacks[';'.join(reversed(stack))] += 1
+        self.samples += 1
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while not self._stop.wait(self.interval):
+            self._sample()
+            if time.monotonic() - last_flush >= PROFILE_FLUSH_SECONDS:
+                self.flush()
+                last_flush = time.monotonic()
+
+    def flush(self):
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w') as f:
+            for stack, count in self._stacks.most_common():
+                f.write(f'{stack} {count}\n')
+        os.replace(tmp_path, self.path)
+
+    def stop(self):
+        if not self._stop.is_set():
+            self._stop.set()
+            self._thread.join()
+            self.flush()
+
+
+_profiler = None
+_profiler_lock = threading.Lock()
+
+
+def start_profiler_from_env():
+    """Starts the process's sampling profiler when CHURN_PROFILE is set; returns it or None.
+
+    Safe to call from every page and entry point: only the first call starts it.
+    """
+    global _profiler
+    setting = os.environ.get(PROFILE_ENV)
+    if not setting or setting == '0':
+        return None
+    with _profiler_lock:
+        if _profiler is None:
+            folder = DEFAULT_PROFILE_DIR if setting == '1' else setting
+            interval = float(os.environ.get(PROFILE_INTERVAL_ENV, DEFAULT_PROFILE_INTERVAL_MS))
+            _profiler = SamplingProfiler(folder, interval).start()
+        return _profiler
+
+
+def profiler():
+    """The running sampling profiler, or None."""
+    return _profiler
@@ -0,0 +1,371 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+from datetime import datetime, timezone
+
+from file_hash import file_sha256
+
+logger = logging.getLogger('model_registry')
+
+# joblib, numpy and pandas are imported where they are used, so resolving the
+# active model (done on every app rerun) stays a couple of small file reads.
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+REGISTRY_DIR = os.path.join(BASE_DIR, 'models', 'registry')
+# Served as the active model until a version is registered and activated
+LEGACY_MODEL_PATH = os.path.join(BASE_DIR, 'models', 'churn_predictor.joblib')
+LEGACY_VERSION = 'legacy'
+POINTER_FILE = 'registry.json'
+MODEL_FILE = 'model.joblib'
+METADATA_FILE = 'metadata.json'
+ROLES = ('active', 'candidate')
+# How often long-running scorers look for a new active version
+DEFAULT_CHECK_INTERVAL = 2.0
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat(timespec='seconds')
+
+
+def _write_json(path, data):
+    """Writes data next to path and swaps it in, so readers never see a partial file."""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def read_pointer(registry_dir=REGISTRY_DIR):
+    """{'active': version or None, 'candidate': version or None, 'updated_at': ...}."""
+    path = os.path.join(registry_dir, POINTER_FILE)
+    if not os.path.exists(path):
+        return {'active': None, 'candidate': None, 'updated_at': None}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _set_pointer(registry_dir, **roles):
+    pointer = read_pointer(registry_dir)
+    pointer.update(roles)
+    pointer['updated_at'] = _now()
+    _write_json(os.path.join(registry_dir, POINTER_FILE), pointer)
+    return pointer
+
+
+def list_versions(registry_dir=REGISTRY_DIR):
+    """Metadata of every registered version, oldest first."""
+    if not os.path.isdir(registry_dir):
+        return []
+    versions = []
+    for name in sorted(os.listdir(registry_dir)):
+        metadata_path = os.path.join(registry_dir, name, METADATA_FILE)
+        if os.path.exists(metadata_path):
+            with open(metadata_path) as f:
+                versions.append(json.load(f))
+    return versions
+
+
+def version_path(version, registry_dir=REGISTRY_DIR):
+    if version == LEGACY_VERSION:
+        return LEGACY_MODEL_PATH
+    path = os.path.join(registry_dir, version, MODEL_FILE)
+    if not os.path.exists(path):
+        raise ValueError(f"Unknown model version: {version}")
+    return path
+
+
+def resolve(role='active', registry_dir=REGISTRY_DIR):
+    """(version, model path) for a role; the active role falls back to the legacy model file."""
+    version = read_pointer(registry_dir).get(role)
+    if version is None:
+        if role == 'active':
+            return LEGACY_VERSION, LEGACY_MODEL_PATH
+        return None, None
+    return version, version_path(version, registry_dir)
+
+
+def register(model_path, registry_dir=REGISTRY_DIR, metrics=None, role=None, source=None):
+    """Copies a saved pipeline into the registry and returns its version.
+
+    The model is stored with its sha256, size and optional training metrics.
+    Registering a file that is already in the registry returns the existing
+    version. role='active' or 'candidate' also points that role at it.
+    """
+    sha256 = file_sha256(model_path)
+    existing = next((v['version'] for v in list_versions(registry_dir) if v['sha256'] == sha256), None)
+    if existing is None:
+        if not os.path.isdir(registry_dir):
+            os.makedirs(registry_dir)
+        numbers = [int(v['version'][1:]) for v in list_versions(registry_dir)]
+        version = f'v{max(numbers, default=0) + 1:04d}'
+        # Build the version in a scratch folder and rename it in one step
+        tmp_dir = os.path.join(registry_dir, f'.{version}.{os.getpid()}.tmp')
+        os.makedirs(tmp_dir)
+        shutil.copy2(model_path, os.path.join(tmp_dir, MODEL_FILE))
+        _write_json(os.path.join(tmp_dir, METADATA_FILE), {
+            'version': version,
+            'sha256': sha256,
+            'size_bytes': os.path.getsize(model_path),
+            'registered_at': _now(),
+            'source': source or os.path.abspath(model_path),
+            'metrics': metrics
+        })
+        os.rename(tmp_dir, os.path.join(registry_dir, version))
+    else:
+        version = existing
+    if role is not None:
+        set_role(role, version, registry_dir)
+    return version
+
+
+def set_role(role, version, registry_dir=REGISTRY_DIR):
+    """Points role ('active' or 'candidate') at version; None clears the candidate."""
+    if role not in ROLES:
+        raise ValueError(f"Unknown role: {role}")
+    if version is not None:
+        version_path(version, registry_dir)
+    elif role == 'active':
+        raise ValueError('The active role needs a version.')
+    return _set_pointer(registry_dir, **{role: version})
+
+
+def promote(registry_dir=REGISTRY_DIR):
+    """Makes the candidate the active version and clears the candidate."""
+    candidate = read_pointer(registry_dir).get('candidate')
+    if candidate is None:
+        raise ValueError('There is no candidate to promote.')
+    return _set_pointer(registry_dir, active=candidate, candidate=None)
+
+
+class RegisteredModel:
+    """The model currently holding a registry role, swapped in when the pointer changes.
+
+    refresh() costs one stat() call at most every check_interval seconds, so
+    it can run on every request; a new version is loaded and swapped in
+    without a restart. scorer_factory(pipeline, model_path) wraps each loaded
+    pipeline (e.g. in a PredictionCache); predict_proba goes through it.
+    """
+
+    def __init__(self, role='active', registry_dir=REGISTRY_DIR, scorer_factory=None,
+                 check_interval=DEFAULT_CHECK_INTERVAL):
+        self.role = role
+        self.registry_dir = registry_dir
+        self.scorer_factory = scorer_factory
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._pointer_mtime = None
+        self._next_check = 0.0
+        self.version = None
+        self.model_path = None
+        self.pipeline = None
+        self.scorer = None
+        self.reloads = 0
+        self._load(*resolve(role, registry_dir))
+
+    def _load(self, version, model_path):
+        if model_path is None:
+            raise ValueError(f"No model holds the '{self.role}' role.")
+        import joblib
+        pipeline = joblib.load(model_path)
+        scorer = self.scorer_factory(pipeline, model_path) if self.scorer_factory else pipeline
+        with self._lock:
+            self.version, self.model_path = version, model_path
+            self.pipeline, self.scorer = pipeline, scorer
+
+    def refresh(self):
+        """Loads the role's version if the registry pointer moved; returns True on a swap."""
+        now = time.monotonic()
+        if now < self._next_check:
+            return False
+        self._next_check = now + self.check_interval
+        pointer_path = os.path.join(self.registry_dir, POINTER_FILE)
+        mtime = os.stat(pointer_path).st_mtime_ns if os.path.exists(pointer_path) else None
+        if mtime == self._pointer_mtime:
+            return False
+        self._pointer_mtime = mtime
+        version, model_path = resolve(self.role, self.registry_dir)
+        if version == self.version or model_path is None:
+            return False
+        self._load(version, model_path)
+        self.reloads += 1
+        return True
+
+    def predict_proba(self, frame):
+        self.refresh()
+        return self.scorer.predict_proba(frame)
+
+    def describe(self):
+        info = {'model': {'role': self.role, 'version': self.version, 'reloads': self.reloads}}
+        if hasattr(self.scorer, 'stats'):
+            info['prediction_cache'] = self.scorer.stats()
+        return info
+
+
+class ShadowStats:
+    """Running agreement and latency between the active and candidate models."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.rows = 0
+        self.tier_agreements = 0
+        self.label_agreements = 0
+        self.abs_diff_sum = 0.0
+        self.max_abs_diff = 0.0
+        self.active_seconds = 0.0
+        self.candidate_seconds = 0.0
+        self.candidate_failures = 0
+
+    def record_failure(self):
+        """Counts a batch the candidate failed to score; returns the failure count so far."""
+        with self._lock:
+            self.candidate_failures += 1
+            return self.candidate_failures
+
+    def record(self, active, candidate, active_seconds, candidate_seconds):
+        import numpy as np
+        from features import risk_tier
+        diff = np.abs(np.asarray(active, dtype=np.float64) - np.asarray(candidate, dtype=np.float64))
+        with self._lock:
+            self.batches += 1
+            self.rows += len(diff)
+            self.tier_agreements += int((risk_tier(active) == risk_tier(candidate)).sum())
+            self.label_agreements += int(((active > 0.5) == (candidate > 0.5)).sum())
+            self.abs_diff_sum += float(diff.sum())
+            self.max_abs_diff = max(self.max_abs_diff, float(diff.max(initial=0.0)))
+            self.active_seconds += active_seconds
+            self.candidate_seconds += candidate_seconds
+
+    def merge(self, other):
+        with self._lock:
+            self.batches += other.batches
+            self.rows += other.rows
+            self.tier_agreements += other.tier_agreements
+            self.label_agreements += other.label_agreements
+            self.abs_diff_sum += other.abs_diff_sum
+            self.max_abs_diff = max(self.max_abs_diff, other.max_abs_diff)
+            self.active_seconds += other.active_seconds
+            self.candidate_seconds += other.candidate_seconds
+            self.candidate_failures += other.candidate_failures
+
+    def snapshot(self):
+        with self._lock:
+            rows = self.rows
+            return {
+                'batches': self.batches,
+                'rows': rows,
+                'risk_tier_agreement': self.tier_agreements / rows if rows else None,
+                'label_agreement': self.label_agreements / rows if rows else None,
+                'mean_abs_probability_diff': self.abs_diff_sum / rows if rows else None,
+                'max_abs_probability_diff': self.max_abs_diff,
+                'active_ms_per_row': self.active_seconds * 1000 / rows if rows else None,
+                'candidate_ms_per_row': self.candidate_seconds * 1000 / rows if rows else None,
+                'latency_overhead': self.candidate_seconds / self.active_seconds if self.active_seconds else None,
+                'candidate_failures': self.candidate_failures
+            }
+
+    def __getstate__(self):
+        # Sent back from batch workers; the lock is recreated on arrival
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+class ShadowScorer:
+    """Scores each batch with the active and the candidate model and returns the active scores.
+
+    The candidate sees exactly the batches the active model sees, so
+    agreement and latency are measured on real traffic; its scores are
+    never returned to callers. A batch the candidate fails on is counted in
+    the stats and the active scores are still returned.
+    """
+
+    def __init__(self, active, candidate):
+        self.active = active
+        self.candidate = candidate
+        self.shadow_stats = ShadowStats()
+
+    @property
+    def pipeline(self):
+        return getattr(self.active, 'pipeline', self.active)
+
+    def predict_proba(self, frame):
+        start = time.perf_counter()
+        active = self.active.predict_proba(frame)
+        active_seconds = time.perf_counter() - start
+        try:
+            candidate = self.candidate.predict_proba(frame)
+        except Exception:
+            # The traceback is logged once; later failures are only counted
+            if self.shadow_stats.record_failure() == 1:
+                logger.exception('The shadow candidate failed to score a batch')
+            return active
+        candidate_seconds = time.perf_counter() - start - active_seconds
+        self.shadow_stats.record(active[:, 1], candidate[:, 1], active_seconds, candidate_seconds)
+        return active
+
+    def take_stats(self):
+        """Returns the stats gathered so far and starts a fresh set."""
+        stats, self.shadow_stats = self.shadow_stats, ShadowStats()
+        return stats
+
+    def describe(self):
+        info = self.active.describe() if hasattr(self.active, 'describe') else {}
+        info['shadow'] = dict(self.shadow_stats.snapshot(), candidate_version=getattr(self.candidate, 'version', None))
+        return info
+
+
+def _print_versions(registry_dir):
+    pointer = read_pointer(registry_dir)
+    versions = list_versions(registry_dir)
+    if not versions:
+        print(f"No registered versions; serving {LEGACY_MODEL_PATH}")
+    for meta in versions:
+        roles = [role for role in ROLES if pointer.get(role) == meta['version']]
+        auc = (meta.get('metrics') or {}).get('holdout', {}).get('roc_auc')
+        print(f"{meta['version']}  {meta['sha256'][:12]}  {meta['registered_at']}"
+              f"{f'  AUC {auc:.3f}' if auc is not None else ''}{'  [' + ', '.join(roles) + ']' if roles else ''}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Manage versioned churn models.')
+    parser.add_argument('--registry', default=REGISTRY_DIR, help='Registry directory')
+    commands = parser.add_subparsers(dest='command', required=True)
+    add = commands.add_parser('register', help='Add a saved pipeline to the registry')
+    add.add_argument('model', help='Path to a saved pipeline (.joblib)')
+    add.add_argument('--metrics', help='Training metrics JSON to store with the version')
+    add.add_argument('--role', choices=ROLES, help='Also make the new version active or the candidate')
+    commands.add_parser('list', help='List versions and roles')
+    activate = commands.add_parser('activate', help='Serve a version as the active model')
+    activate.add_argument('version')
+    candidate = commands.add_parser('candidate', help="Shadow a version against the active model ('none' clears)")
+    candidate.add_argument('version')
+    commands.add_parser('promote', help='Make the candidate the active model')
+    args = parser.parse_args()
+
+    if args.command == 'register':
+        metrics = None
+        if args.metrics:
+            with open(args.metrics) as f:
+                metrics = json.load(f)
+        version = register(args.model, args.registry, metrics, args.role)
+        print(f"Registered {args.model} as {version}")
+    elif args.command == 'activate':
+        set_role('active', args.version, args.registry)
+    elif args.command == 'candidate':
+        set_role('candidate', None if args.version == 'none' else args.version, args.registry)
+    elif args.command == 'promote':
+        promote(args.registry)
+    _print_versions(args.registry)
+
+
+if __name__ == '__main__':
+    main()
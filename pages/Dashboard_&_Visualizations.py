@@ -1,24 +1,48 @@
+import time
+SCRIPT_START = time.perf_counter()
+
 import streamlit as st
+import numpy as np
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from sklearn.preprocessing import MinMaxScaler
 import os
+import sys
 
 PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from dashboard_cube import AggregateCube
+from dashboard_scatter import DEFAULT_MAX_POINTS, binned_density_figure, density_grid, scatter_mode, tenure_charges_figure
+from data_store import load_customers
+from instrumentation import observe, start_profiler_from_env, timed, track_cache
+from startup_timing import StartupTimer, finish, timing_rows
+
+timer = StartupTimer('dashboard', SCRIPT_START)
+timer.mark('imports')
+start_profiler_from_env()
 
 st.set_page_config(page_title="Churn Visualizations", layout="wide")
 
 #Load and Cache Data 
-@st.cache_data
+# Reads the typed columnar store (rebuilt automatically when the raw CSV changes)
+@track_cache('dashboard.load_data', st.cache_data)
 def load_data():
-    df = pd.read_csv('data/raw/WA_Fn-UseC_-Telco-Customer-Churn.csv')
-    df['TotalCharges'] = pd.to_numeric(df['TotalCharges'], errors='coerce')
-    df.dropna(inplace=True)
-    df['Churn_numeric'] = df['Churn'].apply(lambda x: 1 if x == 'Yes' else 0)
-    return df
+    return load_customers(missing_total_charges='drop')
+
+# Counts, churn counts and charge sums per (Contract, InternetService, Churn) cell, plus
+# each cell's tenure x MonthlyCharges histogram for the density chart.
+# Takes no arguments so reruns don't pay for hashing the full frame
+@track_cache('dashboard.load_cube', st.cache_data)
+def load_cube():
+    data = load_data()
+    return AggregateCube(data, grid=density_grid(data))
 
-df = load_data()
+with timer.stage('data_load'):
+    df = load_data()
+with timer.stage('cube_build'):
+    cube = load_cube()
 
 #Custom Styling 
 st.markdown(
@@ -57,9 +81,10 @@ if 'last_prediction_inputs' in st.session_state:
     avg_loyal = df[df['Churn_numeric'] == 0][radar_features].mean().values
     customer_values = [last_customer[f] for f in radar_features]
     
-    # Scale all data for fair comparison on the radar chart
-    scaler = MinMaxScaler()
-    scaled_data = scaler.fit_transform([avg_all, avg_churn, avg_loyal, customer_values])
+    # Min-max scale each feature across the four profiles for a fair comparison on the radar chart
+    profiles = np.array([avg_all, avg_churn, avg_loyal, customer_values], dtype=np.float64)
+    low, span = profiles.min(axis=0), np.ptp(profiles, axis=0)
+    scaled_data = (profiles - low) / np.where(span == 0, 1, span)
 
     # Create Radar Chart
     fig_radar = go.Figure()
@@ -93,6 +118,19 @@ if 'last_prediction_inputs' in st.session_state:
         
     with col2:
         st.plotly_chart(fig_radar, use_container_width=True)
+
+        # Top drivers saved by the prediction page (log-odds contributions from the model)
+        last_drivers = st.session_state.get('last_prediction_drivers')
+        if last_drivers:
+            drivers_df = pd.DataFrame(last_drivers).iloc[::-1]
+            drivers_df['label'] = drivers_df['feature'] + ' = ' + drivers_df['value']
+            fig_drivers = px.bar(drivers_df, x='contribution', y='label', orientation='h',
+                                 color=drivers_df['contribution'] > 0,
+                                 color_discrete_map={True: '#d62728', False: '#00A6FF'},
+                                 labels={'contribution': 'Impact on churn score (log-odds)', 'label': ''},
+                                 template="plotly_dark", title="Top Drivers of This Prediction")
+            fig_drivers.update_layout(showlegend=False)
+            st.plotly_chart(fig_drivers, use_container_width=True)
     st.markdown("---")
 
 
@@ -103,23 +141,22 @@ st.subheader("Overall Customer Base Analysis")
 st.sidebar.header("Dashboard Filters")
 contract_filter = st.sidebar.multiselect(
     'Filter by Contract Type:',
-    options=df['Contract'].unique(),
-    default=df['Contract'].unique()
+    options=cube.members['Contract'],
+    default=cube.members['Contract']
 )
 internet_filter = st.sidebar.multiselect(
     'Filter by Internet Service:',
-    options=df['InternetService'].unique(),
-    default=df['InternetService'].unique()
-)
-
-df_selection = df.query(
-    "Contract == @contract_filter & InternetService == @internet_filter"
+    options=cube.members['InternetService'],
+    default=cube.members['InternetService']
 )
+filters = {'Contract': contract_filter, 'InternetService': internet_filter}
 
-#KPIs
-total_customers = df_selection.shape[0]
-churn_rate = (df_selection['Churn'] == 'Yes').sum() / total_customers * 100 if total_customers > 0 else 0
-avg_monthly_charges = df_selection['MonthlyCharges'].mean()
+#KPIs (summed from the cube, so the cost does not grow with the number of rows)
+with timed('dashboard.kpis'):
+    kpis = cube.totals(filters)
+total_customers = kpis['customers']
+churn_rate = kpis['churn_rate']
+avg_monthly_charges = kpis['avg_monthly_charges']
 
 kpi1, kpi2, kpi3 = st.columns(3)
 with kpi1:
@@ -129,27 +166,54 @@ with kpi2:
 with kpi3:
     st.metric("Avg. Monthly Charge", f"${avg_monthly_charges:.2f}")
 
+timer.mark('first_render')
+
 st.markdown("---")
 
 #Visualization
 col1, col2 = st.columns(2)
 with col1:
     st.write("#### Churn by Contract Type")
-    fig_contract = px.histogram(df_selection, x='Contract', color='Churn',
-                                barmode='group', text_auto=True,
-                                color_discrete_map={'Yes': '#d62728', 'No': '#00A6FF'},
-                                template="plotly_dark")
+    with timed('dashboard.contract_figure'):
+        contract_counts = cube.rollup(['Contract', 'Churn'], filters)
+        fig_contract = px.bar(contract_counts, x='Contract', y='customers', color='Churn',
+                              barmode='group', text_auto=True,
+                              labels={'customers': 'count'},
+                              color_discrete_map={'Yes': '#d62728', 'No': '#00A6FF'},
+                              template="plotly_dark")
     st.plotly_chart(fig_contract, use_container_width=True)
 
 with col2:
     st.write("#### Internet Service Distribution")
-    fig_internet = px.pie(df_selection, names='InternetService', hole=0.4,
-                          template="plotly_dark")
+    with timed('dashboard.internet_figure'):
+        internet_counts = cube.rollup(['InternetService'], filters)
+        fig_internet = px.pie(internet_counts, names='InternetService', values='customers', hole=0.4,
+                              template="plotly_dark")
     st.plotly_chart(fig_internet, use_container_width=True)
 
 st.write("#### Monthly Charges vs. Tenure by Churn")
-fig_scatter = px.scatter(df_selection, x='tenure', y='MonthlyCharges', color='Churn',
-                         title="Higher monthly charges for shorter tenures correlate with churn",
-                         color_discrete_map={'Yes': '#d62728', 'No': '#00A6FF'},
-                         template="plotly_dark")
-st.plotly_chart(fig_scatter, use_container_width=True)
\ No newline at end of file
+# Large selections are binned or sampled server-side so the browser payload stays bounded
+with st.sidebar.expander("Scatter Rendering"):
+    max_points = st.number_input('Plot every point up to (rows):', min_value=500, max_value=1_000_000,
+                                 value=DEFAULT_MAX_POINTS, step=500)
+    large_mode = st.radio('Above that, show:', ('density', 'sample'),
+                          format_func=lambda m: 'Density per churn class' if m == 'density' else 'Stratified sample')
+# Density is summed from the cube's cells; only the point modes need the selected rows
+rendering_mode = scatter_mode(total_customers, max_points, large_mode)
+with timed('dashboard.scatter_figure'):
+    if rendering_mode == 'density':
+        fig_scatter = binned_density_figure(cube.grid_counts(filters), cube.grid, total_customers)
+    else:
+        with timed('dashboard.filter'):
+            df_selection = df.query(
+                "Contract == @contract_filter & InternetService == @internet_filter"
+            )
+        fig_scatter, rendering_mode = tenure_charges_figure(df_selection, max_points=max_points, large_mode=large_mode)
+st.plotly_chart(fig_scatter, use_container_width=True)
+st.caption(f"Rendering mode: {rendering_mode} ({total_customers:,} customers selected)")
+
+#Startup Timing
+observe('dashboard.rerun', time.perf_counter() - SCRIPT_START)
+process_report, session_report = finish(timer, st.session_state)
+with st.expander("⏱️ Startup timing"):
+    st.dataframe(timing_rows(process_report, session_report), hide_index=True, use_container_width=True)
@@ -0,0 +1,114 @@
+import streamlit as st
+import pandas as pd
+import plotly.express as px
+import json
+import os
+import sys
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from drift import (DEFAULT_LIVE_PATH, DEFAULT_REFERENCE_PATH, SCORE_FEATURE, DriftStore, distribution,
+                   drift_report, load_reference)
+from instrumentation import start_profiler_from_env, timed, track_cache
+
+start_profiler_from_env()
+
+st.set_page_config(page_title="Drift Monitoring", layout="wide")
+
+st.title("📈 Data & Prediction Drift")
+st.markdown("Compares the customers scored by batch jobs and the prediction API with the customers the model was trained on.")
+
+#Load Statistics
+if not os.path.exists(DEFAULT_REFERENCE_PATH):
+    st.info("No reference statistics yet. Run `python train.py` or `python drift.py reference` to create them.")
+    st.stop()
+
+@track_cache('drift.load_reference_stats', st.cache_data)
+def load_reference_stats(mtime):
+    return load_reference(DEFAULT_REFERENCE_PATH)
+
+# Live counts are small (a few hundred buckets), so re-reading them every 30s is cheap
+@track_cache('drift.load_live_stats', st.cache_data(ttl=30))
+def load_live_stats():
+    return DriftStore(DEFAULT_LIVE_PATH).load()
+
+reference, reference_meta = load_reference_stats(os.path.getmtime(DEFAULT_REFERENCE_PATH))
+live, started_at = load_live_stats()
+with timed('drift.report'):
+    report = drift_report(reference, live, started_at)
+
+STATUS_ICONS = {'stable': '🟢', 'moderate': '🟡', 'significant': '🔴', 'insufficient data': '⚪'}
+
+#KPIs
+kpi1, kpi2, kpi3, kpi4 = st.columns(4)
+with kpi1:
+    st.metric("Overall Status", f"{STATUS_ICONS[report['overall_status']]} {report['overall_status'].title()}")
+with kpi2:
+    st.metric("Customers Scored in Window", f"{report['live_rows']:,}")
+with kpi3:
+    st.metric("Score PSI", f"{report['score']['psi']:.3f}")
+with kpi4:
+    st.metric("Reference Customers", f"{report['reference_rows']:,}")
+st.caption(f"Window started {started_at} · reference built {reference_meta.get('created_at')} · "
+           "PSI below 0.1 is stable, 0.1-0.25 moderate, above 0.25 significant")
+
+if report['live_rows'] == 0:
+    st.info("No live traffic recorded yet. Score with `batch_score.py --drift` or serve with `serve.py --drift`.")
+    st.stop()
+
+st.markdown("---")
+
+#Per-Feature Drift
+col1, col2 = st.columns([0.45, 0.55], gap="large")
+with col1:
+    st.write("#### Drift by Feature")
+    feature_table = pd.DataFrame([
+        {
+            'Feature': name,
+            'Status': f"{STATUS_ICONS[result['status']]} {result['status']}",
+            'PSI': round(result['psi'], 4),
+            'KS': round(result['ks'], 4) if 'ks' in result else None
+        }
+        for name, result in report['features'].items()
+    ]).sort_values('PSI', ascending=False)
+    st.dataframe(feature_table, hide_index=True, use_container_width=True)
+
+with col2:
+    st.write("#### Reference vs. Live Distribution")
+    options = [SCORE_FEATURE] + feature_table['Feature'].tolist()
+    selected = st.selectbox('Feature:', options,
+                            format_func=lambda f: 'Churn probability (model output)' if f == SCORE_FEATURE else f)
+    labels, reference_counts = distribution(reference, selected)
+    _, live_counts = distribution(live, selected)
+    ref_total = max(sum(reference_counts), 1)
+    live_total = max(sum(live_counts), 1)
+    shares = pd.DataFrame({
+        'bin': labels * 2,
+        'share': [c / ref_total for c in reference_counts] + [c / live_total for c in live_counts],
+        'population': ['Reference'] * len(labels) + ['Live'] * len(labels)
+    })
+    fig_dist = px.bar(shares, x='bin', y='share', color='population', barmode='group',
+                      labels={'share': 'share of customers', 'bin': ''},
+                      color_discrete_map={'Reference': 'grey', 'Live': '#00A6FF'},
+                      template="plotly_dark")
+    fig_dist.update_yaxes(tickformat='.0%')
+    st.plotly_chart(fig_dist, use_container_width=True)
+
+#Report Export and Window Reset
+st.markdown("---")
+dcol1, dcol2 = st.columns(2)
+with dcol1:
+    st.download_button(
+        label="Download Drift Report (JSON)",
+        data=json.dumps(report, indent=2),
+        file_name='drift_report.json',
+        mime='application/json',
+        use_container_width=True
+    )
+with dcol2:
+    if st.button("Start a New Monitoring Window", use_container_width=True):
+        DriftStore(DEFAULT_LIVE_PATH).reset()
+        load_live_stats.clear()
+        st.rerun()
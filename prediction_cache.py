@@ -0,0 +1,345 @@
+import hashlib
+import io
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+from features import CHARGE_COLUMNS, CHARGE_DECIMALS, FEATURE_COLUMNS, NUMERICAL_FEATURES
+from file_hash import file_sha256, read_with_sha256
+from instrumentation import record_batch, record_cache, timed
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_STORE_PATH = os.path.join(BASE_DIR, '.cache', 'prediction_cache.sqlite')
+DEFAULT_MAXSIZE = 100_000
+DEFAULT_MAX_STORE_ENTRIES = 1_000_000
+# Joins the canonical field values before hashing; never appears in the data
+_SEPARATOR = '\x1f'
+_SQLITE_BATCH = 500
+# Stored entries read again within this many seconds keep their last_used time,
+# so repeated lookups of hot customers do not rewrite their rows
+_TOUCH_SECONDS = 3600
+
+
+def _factorized_columns(frame):
+    """(codes, canonical distinct values) of each model feature, in FEATURE_COLUMNS order.
+
+    Only the distinct values are converted, so category columns and large
+    batches stay cheap.
+    """
+    columns = []
+    for col in FEATURE_COLUMNS:
+        if col in NUMERICAL_FEATURES:
+            values = np.asarray(frame[col], dtype=np.float64)
+            if col in CHARGE_COLUMNS:
+                values = np.round(values, CHARGE_DECIMALS)
+            codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        else:
+            codes, uniques = pd.factorize(frame[col], use_na_sentinel=False)
+            uniques = np.asarray(uniques).astype(str).astype(object)
+        columns.append((codes, np.asarray(uniques)))
+    return columns
+
+
+def canonical_frame(frame):
+    """The 19 model features in a fixed order, numerics as float64 and categoricals as str.
+
+    Charges are rounded to whole cents, as data_store.to_model_frame does, so
+    float32 charges from the columnar store score like the CSV's float64 ones.
+    """
+    return pd.DataFrame({col: uniques[codes] for col, (codes, uniques) in zip(FEATURE_COLUMNS, _factorized_columns(frame))})
+
+
+def _charge_value(col, value):
+    value = float(value)
+    return float(np.round(value, CHARGE_DECIMALS)) if col in CHARGE_COLUMNS else value
+
+
+def record_key(record):
+    """Cache key of one feature dict; matches frame_keys for the same customer."""
+    text = _SEPARATOR.join(
+        str(_charge_value(col, record[col])) if col in NUMERICAL_FEATURES else str(record[col])
+        for col in FEATURE_COLUMNS
+    )
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=16).hexdigest()
+
+
+def frame_keys(frame):
+    """Cache key per row, built from the same canonical text as record_key.
+
+    Numerics go through float64 and charges are rounded to cents, so 1, 1.0
+    and np.int8(1), or a charge read back from float32, produce the same key
+    whether the row came from the app, a CSV chunk or the columnar store.
+    Each column's distinct values are formatted once and the rows are joined
+    from those strings.
+    """
+    text = [np.array([str(value) for value in uniques.tolist()], dtype=object)[codes]
+            for codes, uniques in _factorized_columns(frame)]
+    return [hashlib.blake2b(_SEPARATOR.join(row).encode('utf-8'), digest_size=16).hexdigest() for row in zip(*text)]
+
+
+class SQLiteStore:
+    """On-disk (model hash, key) -> value table shared by every process on the host."""
+
+    def __init__(self, path=DEFAULT_STORE_PATH, max_entries=DEFAULT_MAX_STORE_ENTRIES, table='predictions'):
+        folder = os.path.dirname(path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder)
+        self.max_entries = max_entries
+        self.table = table
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                f'CREATE TABLE IF NOT EXISTS {table} ('
+                'model_sha TEXT, key TEXT, value, last_used REAL, '
+                'PRIMARY KEY (model_sha, key)) WITHOUT ROWID'
+            )
+            self._conn.execute(f'CREATE INDEX IF NOT EXISTS {table}_last_used ON {table} (last_used)')
+
+    def get_many(self, model_sha, keys):
+        """Returns {key: value} for the stored keys and marks them recently used."""
+        found = {}
+        stale = []
+        now = time.time()
+        with self._lock, self._conn:
+            for i in range(0, len(keys), _SQLITE_BATCH):
+                batch = keys[i:i + _SQLITE_BATCH]
+                placeholders = ','.join('?' * len(batch))
+                rows = self._conn.execute(
+                    f'SELECT key, value, last_used FROM {self.table} WHERE model_sha = ? AND key IN ({placeholders})',
+                    [model_sha, *batch]
+                )
+                for key, value, last_used in rows:
+                    found[key] = value
+                    if now - last_used > _TOUCH_SECONDS:
+                        stale.append(key)
+            if stale:
+                self._conn.executemany(
+                    f'UPDATE {self.table} SET last_used = ? WHERE model_sha = ? AND key = ?',
+                    [(now, model_sha, key) for key in stale]
+                )
+        return found
+
+    def put_many(self, model_sha, items):
+        """Stores (key, value) pairs and trims the table back to max_entries."""
+        now = time.time()
+        evicted = 0
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f'INSERT OR REPLACE INTO {self.table} VALUES (?, ?, ?, ?)',
+                [(model_sha, key, value, now) for key, value in items]
+            )
+            count = self._conn.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+            if count > self.max_entries:
+                evicted = count - self.max_entries
+                self._conn.execute(
+                    f'DELETE FROM {self.table} WHERE (model_sha, key) IN '
+                    f'(SELECT model_sha, key FROM {self.table} ORDER BY last_used LIMIT ?)',
+                    (evicted,)
+                )
+        return evicted
+
+
+class KeyedModelCache:
+    """Bounded LRU of per-customer model outputs, scoped to the model file's hash.
+
+    Subclasses define what is computed for the rows that miss (_compute, from
+    the pipeline as prepared by _bind) and how values are stored on disk
+    (_encode/_decode). With store_path set, misses also consult an on-disk
+    table shared across worker processes.
+
+    Values are always stored under the hash of the model that computed them:
+    when the file at model_path is replaced, the pipeline is reloaded from the
+    bytes that were hashed, and on_reload (if given) is applied to it.
+    """
+
+    store_table = None
+
+    def __init__(self, pipeline, model_path, maxsize=DEFAULT_MAXSIZE, store_path=None,
+                 max_store_entries=DEFAULT_MAX_STORE_ENTRIES, on_reload=None):
+        self.model_path = model_path
+        self.maxsize = maxsize
+        self.on_reload = on_reload
+        self.store = SQLiteStore(store_path, max_store_entries, self.store_table) if store_path else None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        stat = os.stat(model_path)
+        self._model_version = (stat.st_mtime_ns, stat.st_size)
+        # (pipeline, sha256 of its file, what _compute uses), swapped as one
+        self._model = (pipeline, file_sha256(model_path), self._bind(pipeline))
+        self.reloads = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.store_hits = 0
+
+    @property
+    def pipeline(self):
+        return self._model[0]
+
+    @property
+    def model_sha(self):
+        return self._model[1]
+
+    def _bind(self, pipeline):
+        """What _compute is given for a loaded pipeline; the pipeline itself by default."""
+        return pipeline
+
+    def _compute(self, bound, canon):
+        """Model outputs for a canonical frame, one entry per row."""
+        raise NotImplementedError
+
+    def _encode(self, value):
+        return value
+
+    def _decode(self, value):
+        return value
+
+    def _check_model(self):
+        """The current (pipeline, model hash, bound model), reloaded when the model file's contents change.
+
+        The file is only re-hashed when its size or mtime changes. The new
+        pipeline is loaded from the same bytes that were hashed, so a file
+        replaced again mid-reload cannot pair one model with another's hash.
+        """
+        stat = os.stat(self.model_path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            model = self._model
+            if version == self._model_version:
+                return model
+        data, model_sha = read_with_sha256(self.model_path)
+        if model_sha != model[1]:
+            import joblib
+            pipeline = joblib.load(io.BytesIO(data))
+            if self.on_reload is not None:
+                self.on_reload(pipeline)
+            model = (pipeline, model_sha, self._bind(pipeline))
+        with self._lock:
+            if model[1] != self._model[1]:
+                self._entries.clear()
+                self.reloads += 1
+            self._model = model
+            self._model_version = version
+        return model
+
+    def _remember(self, items, model_sha):
+        with self._lock:
+            # Values computed by a model that was swapped out meanwhile are dropped
+            if model_sha != self._model[1]:
+                return
+            for key, value in items:
+                self._entries[key] = value
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def _lookup(self, keys, model_sha):
+        """Returns ({row: cached value}, {key: row positions still missing})."""
+        found_rows = {}
+        missing = {}
+        with self._lock:
+            for i, key in enumerate(keys):
+                value = self._entries.get(key)
+                if value is None:
+                    missing.setdefault(key, []).append(i)
+                else:
+                    self._entries.move_to_end(key)
+                    found_rows[i] = value
+
+        store_hits = 0
+        if missing and self.store is not None:
+            found = {key: self._decode(value) for key, value in self.store.get_many(model_sha, list(missing)).items()}
+            for key, value in found.items():
+                for i in missing.pop(key):
+                    found_rows[i] = value
+                    store_hits += 1
+            self._remember(found.items(), model_sha)
+
+        with self._lock:
+            self.hits += len(found_rows)
+            self.store_hits += store_hits
+        record_cache(self.store_table, hits=len(found_rows), misses=sum(len(rows) for rows in missing.values()))
+        return found_rows, missing
+
+    def _fill_missing(self, frame, found_rows, missing, model):
+        _, model_sha, bound = model
+        # Duplicate rows within a batch are computed once
+        first_rows = [rows[0] for rows in missing.values()]
+        record_batch(self.store_table, len(first_rows))
+        with timed(f'model.{self.store_table}'):
+            computed = self._compute(bound, canonical_frame(frame.iloc[first_rows]))
+        new_items = list(zip(missing, computed))
+        for rows, value in zip(missing.values(), computed):
+            for i in rows:
+                found_rows[i] = value
+        self._remember(new_items, model_sha)
+        if self.store is not None:
+            evicted = self.store.put_many(model_sha, [(key, self._encode(value)) for key, value in new_items])
+            with self._lock:
+                self.evictions += evicted
+        with self._lock:
+            self.misses += sum(len(rows) for rows in missing.values())
+
+    def get_many(self, frame):
+        """Cached or freshly computed value for every row of frame, in order."""
+        model = self._check_model()
+        found_rows, missing = self._lookup(frame_keys(frame), model[1])
+        if missing:
+            self._fill_missing(frame, found_rows, missing, model)
+        return [found_rows[i] for i in range(len(found_rows))]
+
+    def get_one(self, record):
+        """Value for one feature dict without building a DataFrame on a hit."""
+        model = self._check_model()
+        found_rows, missing = self._lookup([record_key(record)], model[1])
+        if missing:
+            self._fill_missing(pd.DataFrame([record]), found_rows, missing, model)
+        return found_rows[0]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'store_hits': self.store_hits,
+                'evictions': self.evictions,
+                'reloads': self.reloads,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'model_sha256': self._model[1]
+            }
+
+
+class PredictionCache(KeyedModelCache):
+    """Bounded LRU of churn probabilities in front of pipeline.predict_proba.
+
+    Only rows missing from both the in-process and on-disk caches reach the
+    model. predict_proba has the sklearn shape, so the cache can stand in for
+    the pipeline in batch scoring and the prediction service.
+    """
+
+    store_table = 'predictions'
+
+    def _compute(self, pipeline, canon):
+        # XGBoost returns float32; float64 storage round-trips to the same value
+        return pipeline.predict_proba(canon)[:, 1].astype(np.float64).tolist()
+
+    def churn_probabilities(self, frame):
+        return np.array(self.get_many(frame), dtype=np.float32)
+
+    def predict_proba(self, frame):
+        probabilities = self.churn_probabilities(frame)
+        return np.column_stack([1 - probabilities, probabilities])
+
+    def predict_one(self, record):
+        return float(np.float32(self.get_one(record)))
@@ -0,0 +1,341 @@
+import argparse
+import json
+import logging
+import queue
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from batch_score import make_scorer
+from drift import DEFAULT_LIVE_PATH, DriftMonitor
+from features import FEATURE_COLUMNS, FIELD_OPTIONS, NUMERICAL_FEATURES, risk_tier
+from instrumentation import prometheus_text, record_batch, start_profiler_from_env, timed
+from model_registry import RegisteredModel, ShadowScorer
+from prediction_cache import DEFAULT_STORE_PATH, PredictionCache
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8502
+DEFAULT_MAX_BATCH_SIZE = 256
+DEFAULT_MAX_WAIT_MS = 5.0
+LATENCY_WINDOW = 10_000
+# How long a request waits for its batch before answering 503
+RESULT_TIMEOUT_SECONDS = 30.0
+
+logger = logging.getLogger('serve')
+
+
+class ServiceStats:
+    """Thread-safe request latencies (recent window) and batch-size histogram."""
+
+    def __init__(self, window=LATENCY_WINDOW):
+        self._lock = threading.Lock()
+        self._latencies_ms = deque(maxlen=window)
+        self._batch_sizes = Counter()
+        self.requests = 0
+        self.rows = 0
+        self.model_calls = 0
+
+    def record_request(self, latency_ms, rows):
+        with self._lock:
+            self._latencies_ms.append(latency_ms)
+            self.requests += 1
+            self.rows += rows
+
+    def record_batch(self, size):
+        # Bucket batch sizes by powers of two so the histogram stays small
+        bucket = 1 << (size - 1).bit_length()
+        with self._lock:
+            self._batch_sizes[bucket] += 1
+            self.model_calls += 1
+
+    def snapshot(self):
+        with self._lock:
+            latencies = np.array(self._latencies_ms)
+            batch_sizes = dict(sorted(self._batch_sizes.items()))
+            requests, rows, model_calls = self.requests, self.rows, self.model_calls
+        latency = {}
+        if latencies.size:
+            latency = {
+                'p50': float(np.percentile(latencies, 50)),
+                'p99': float(np.percentile(latencies, 99)),
+                'max': float(latencies.max()),
+                'window': int(latencies.size)
+            }
+        return {
+            'requests': requests,
+            'rows': rows,
+            'model_calls': model_calls,
+            'rows_per_model_call': rows / model_calls if model_calls else 0.0,
+            'latency_ms': latency,
+            'batch_size_histogram': {f'<={size}': count for size, count in batch_sizes.items()}
+        }
+
+
+class MicroBatcher:
+    """Coalesces records from concurrent requests into one predict_proba call.
+
+    A batch is flushed when it reaches max_batch_size rows or when
+    max_wait_ms has passed since its first request arrived. With a drift
+    monitor, every scored batch is added to its live statistics.
+    """
+
+    def __init__(self, pipeline, max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS, stats=None,
+                 monitor=None):
+        self.pipeline = pipeline
+        self.monitor = monitor
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats = stats or ServiceStats()
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, records):
+        """Queues a list of feature dicts and returns a Future of their probabilities."""
+        future = Future()
+        self._queue.put((records, future))
+        return future
+
+    def _collect(self):
+        items = [self._queue.get()]
+        rows = len(items[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            items.append(item)
+            rows += len(item[0])
+        return items
+
+    def _run(self):
+        while True:
+            items = self._collect()
+            records = [record for item_records, _ in items for record in item_records]
+            try:
+                frame = pd.DataFrame.from_records(records, columns=FEATURE_COLUMNS)
+                with timed('serve.batch'):
+                    probabilities = self.pipeline.predict_proba(frame)[:, 1]
+            except Exception as exc:
+                for _, future in items:
+                    future.set_exception(exc)
+                continue
+            offset = 0
+            for item_records, future in items:
+                future.set_result(probabilities[offset:offset + len(item_records)])
+                offset += len(item_records)
+            # Bookkeeping runs after the responses are released and never stops the batcher
+            try:
+                self.stats.record_batch(len(records))
+                record_batch('serve', len(records))
+                if self.monitor is not None:
+                    self.monitor.observe(frame, probabilities)
+            except Exception:
+                logger.exception('Recording a scored batch failed')
+
+
+def validate_record(record):
+    """Returns a clean feature dict for the model or raises ValueError.
+
+    Numerics must convert to float; discrete fields must hold one of the
+    values in FIELD_OPTIONS, which the model was trained on.
+    """
+    if not isinstance(record, dict):
+        raise ValueError('Each record must be a JSON object.')
+    missing = [col for col in FEATURE_COLUMNS if col not in record]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    clean = {col: record[col] for col in FEATURE_COLUMNS}
+    for col in NUMERICAL_FEATURES:
+        try:
+            clean[col] = float(clean[col])
+        except (TypeError, ValueError):
+            raise ValueError(f"Field '{col}' must be numeric.")
+    for col, options in FIELD_OPTIONS.items():
+        if clean[col] not in options:
+            allowed = ', '.join(json.dumps(option) for option in options)
+            raise ValueError(f"Field '{col}' must be one of {allowed}; got {json.dumps(record[col])}.")
+    return clean
+
+
+def format_predictions(probabilities):
+    tiers = risk_tier(probabilities)
+    return [
+        {'churn_probability': float(prob), 'risk_tier': str(tier)}
+        for prob, tier in zip(probabilities, tiers)
+    ]
+
+
+class PredictionHandler(BaseHTTPRequestHandler):
+    # Set on the server by make_server
+    batcher = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status, text, content_type):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_json(self):
+        length = int(self.headers.get('Content-Length', 0))
+        return json.loads(self.rfile.read(length) or b'null')
+
+    def do_GET(self):
+        if self.path == '/health':
+            self._send_json(200, {'status': 'ok'})
+        elif self.path == '/metrics':
+            metrics = self.batcher.stats.snapshot()
+            scorer = self.batcher.pipeline
+            if hasattr(scorer, 'describe'):
+                metrics.update(scorer.describe())
+            elif hasattr(scorer, 'stats'):
+                metrics['prediction_cache'] = scorer.stats()
+            self._send_json(200, metrics)
+        elif self.path == '/metrics/prometheus':
+            self._send_text(200, prometheus_text(), 'text/plain; version=0.0.4')
+        else:
+            self._send_json(404, {'error': 'Not found'})
+
+    def do_POST(self):
+        if self.path not in ('/predict', '/predict/batch'):
+            self._send_json(404, {'error': 'Not found'})
+            return
+        start = time.perf_counter()
+        try:
+            payload = self._read_json()
+            if self.path == '/predict':
+                records = [validate_record(payload)]
+            else:
+                if isinstance(payload, dict):
+                    payload = payload.get('records')
+                if not isinstance(payload, list) or not payload:
+                    raise ValueError("Batch requests need a non-empty 'records' list.")
+                records = [validate_record(record) for record in payload]
+        except ValueError as exc:
+            self._send_json(400, {'error': str(exc)})
+            return
+
+        try:
+            probabilities = self.batcher.submit(records).result(timeout=RESULT_TIMEOUT_SECONDS)
+        except FutureTimeoutError:
+            self._send_json(503, {'error': f'No prediction within {RESULT_TIMEOUT_SECONDS:g}s; try again later.'})
+            return
+        except Exception as exc:
+            self._send_json(500, {'error': str(exc)})
+            return
+        self.batcher.stats.record_request((time.perf_counter() - start) * 1000, len(records))
+
+        predictions = format_predictions(probabilities)
+        if self.path == '/predict':
+            self._send_json(200, predictions[0])
+        else:
+            self._send_json(200, {'predictions': predictions})
+
+
+class PredictionServer(ThreadingHTTPServer):
+    # The socketserver default backlog of 5 drops connections under load tests
+    request_queue_size = 1024
+
+
+def make_registered_scorer(cache_path=None, shadow=False):
+    """The registry's active model, reloaded when it changes, optionally shadowed by the candidate.
+
+    The candidate goes through the same cache as the active model, so the
+    shadow latency compares like with like. Without a registered candidate
+    the server starts without a shadow.
+    """
+    def cached(pipeline, model_path):
+        return PredictionCache(pipeline, model_path, store_path=cache_path)
+
+    factory = cached if cache_path else None
+    scorer = RegisteredModel('active', scorer_factory=factory)
+    if shadow:
+        try:
+            candidate = RegisteredModel('candidate', scorer_factory=factory)
+        except ValueError as e:
+            logger.warning('%s Serving without a shadow model.', e)
+        else:
+            scorer = ShadowScorer(scorer, candidate)
+    return scorer
+
+
+def make_server(host=DEFAULT_HOST, port=DEFAULT_PORT, model_path=None,
+                max_batch_size=DEFAULT_MAX_BATCH_SIZE, max_wait_ms=DEFAULT_MAX_WAIT_MS, cache_path=None, drift_path=None,
+                shadow=False):
+    """Loads the model once and returns a ready-to-serve HTTP server.
+
+    Without model_path the registry's active version is served and swapped
+    for a new one as soon as it is activated; shadow also scores every
+    micro-batch with the candidate version.
+    """
+    if model_path is None:
+        pipeline = make_registered_scorer(cache_path, shadow)
+    else:
+        pipeline = make_scorer(model_path, cache_path)
+    monitor = DriftMonitor(drift_path, background=True) if drift_path else None
+    handler = type('BoundPredictionHandler', (PredictionHandler,), {
+        'batcher': MicroBatcher(pipeline, max_batch_size, max_wait_ms, monitor=monitor)
+    })
+    return PredictionServer((host, port), handler)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve churn predictions over HTTP with micro-batching.')
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--model', default=None,
+                        help="Serve this saved pipeline instead of the registry's active version")
+    parser.add_argument('--max-batch-size', type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help='Maximum rows coalesced into one model call')
+    parser.add_argument('--max-wait-ms', type=float, default=DEFAULT_MAX_WAIT_MS,
+                        help='How long the first request in a batch waits for others')
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_STORE_PATH, default=None, metavar='PATH',
+                        help='Serve repeated customers from the on-disk prediction cache')
+    parser.add_argument('--drift', nargs='?', const=DEFAULT_LIVE_PATH, default=None, metavar='PATH',
+                        help='Add served customers to the drift monitor\'s live statistics')
+    parser.add_argument('--shadow', action='store_true',
+                        help="Also score every batch with the registry's candidate model (reported in /metrics)")
+    args = parser.parse_args()
+
+    if args.shadow and args.model:
+        parser.error('--shadow compares registry versions and cannot be combined with --model')
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+    start_profiler_from_env()
+    server = make_server(args.host, args.port, args.model, args.max_batch_size, args.max_wait_ms, args.cache,
+                         args.drift, args.shadow)
+    print(f"Serving churn predictions on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        monitor = server.RequestHandlerClass.batcher.monitor
+        if monitor is not None:
+            monitor.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from instrumentation import observe
+
+logger = logging.getLogger('startup')
+
+# First run of each page in this server process (the cold start), and work
+# done off the script thread such as background model loads
+_process_reports = {}
+_background_seconds = {}
+_lock = threading.Lock()
+
+
+class StartupTimer:
+    """Wall-clock breakdown of one Streamlit script run.
+
+    Stages are timed with stage() or record(); mark() stores the time since
+    the run started, e.g. when the first screen of widgets has been sent.
+    Every run also feeds the '<page>.<stage>' latency histograms.
+    """
+
+    def __init__(self, page, start=None):
+        self.page = page
+        self.start = start if start is not None else time.perf_counter()
+        self.stages = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def record(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+        observe(f'{self.page}.{name}', seconds)
+
+    def mark(self, name):
+        self.stages[name] = time.perf_counter() - self.start
+        observe(f'{self.page}.{name}', self.stages[name])
+
+    def report(self):
+        return {
+            'page': self.page,
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            'total_seconds': round(time.perf_counter() - self.start, 4)
+        }
+
+
+def record_background(name, seconds):
+    """Records work done on a background thread (e.g. model deserialization)."""
+    with _lock:
+        _background_seconds[name] = round(seconds, 4)
+    observe(f'background.{name}', seconds)
+    logger.info("Background stage '%s' took %.3fs", name, seconds)
+
+
+def background_stages():
+    with _lock:
+        return dict(_background_seconds)
+
+
+def finish(timer, session_state):
+    """Keeps the report of this page's first run in the process and in the session.
+
+    Returns (process report, session report); later reruns leave both unchanged.
+    """
+    report = timer.report()
+    with _lock:
+        if timer.page not in _process_reports:
+            _process_reports[timer.page] = report
+            logger.info("Cold start of %s: %s", timer.page, report)
+        process_report = _process_reports[timer.page]
+    key = f'startup_report_{timer.page}'
+    if key not in session_state:
+        session_state[key] = report
+    return process_report, session_state[key]
+
+
+def timing_rows(process_report, session_report, background=None):
+    """Table rows comparing the process's cold start with this session's first run."""
+    names = list(dict.fromkeys(list(process_report['stages']) + list(session_report['stages'])))
+    rows = [
+        {
+            'Stage': name,
+            'Cold start (s)': process_report['stages'].get(name),
+            'This session (s)': session_report['stages'].get(name)
+        }
+        for name in names
+    ]
+    for name, seconds in (background or {}).items():
+        rows.append({'Stage': f'{name} (background)', 'Cold start (s)': seconds, 'This session (s)': None})
+    rows.append({
+        'Stage': 'total',
+        'Cold start (s)': process_report['total_seconds'],
+        'This session (s)': session_report['total_seconds']
+    })
+    return rows
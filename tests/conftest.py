@@ -0,0 +1,49 @@
+import os
+import sys
+
+import joblib
+import pytest
+from sklearn.pipeline import Pipeline
+from xgboost import XGBClassifier
+
+# The modules live flat in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture(scope='session')
+def training_data():
+    from train import load_training_data
+    return load_training_data()
+
+
+@pytest.fixture(scope='session')
+def two_models(training_data, tmp_path_factory):
+    """Paths of two differently trained pipelines, as (first, second)."""
+    from train import make_preprocessor
+    X, y = training_data
+    folder = tmp_path_factory.mktemp('models')
+    paths = []
+    for i, (n_estimators, max_depth) in enumerate(((5, 2), (40, 5))):
+        pipeline = Pipeline(steps=[
+            ('preprocessor', make_preprocessor()),
+            ('classifier', XGBClassifier(n_estimators=n_estimators, max_depth=max_depth, random_state=i))
+        ]).fit(X, y)
+        path = folder / f'model_{i}.joblib'
+        joblib.dump(pipeline, path)
+        paths.append(str(path))
+    return tuple(paths)
+
+
+
+@pytest.fixture
+def model_file(two_models, tmp_path):
+    """(path holding the first model, swap) where swap() overwrites it in place with the second model."""
+    path = tmp_path / 'churn_predictor.joblib'
+    path.write_bytes(open(two_models[0], 'rb').read())
+
+    def swap():
+        # Rewritten in place, the way train.py retrains to the same path
+        with open(path, 'wb') as f:
+            f.write(open(two_models[1], 'rb').read())
+
+    return str(path), swap
@@ -0,0 +1,19 @@
+import joblib
+import numpy as np
+import pytest
+
+from compiled_model import CompiledChurnModel, export_artifact
+
+
+@pytest.mark.parametrize('model', [0, 1])
+def test_compiled_model_matches_the_pipeline(two_models, training_data, tmp_path, model):
+    X, _ = training_data
+    pipeline = joblib.load(two_models[model])
+    artifact = export_artifact(pipeline, str(tmp_path / 'compiled.npz'), two_models[model])
+    compiled = CompiledChurnModel.load(artifact)
+
+    expected = pipeline.predict_proba(X)[:, 1]
+    np.testing.assert_allclose(compiled.churn_probabilities(X), expected, rtol=0, atol=1e-6)
+    records = X.iloc[:50].to_dict('records')
+    np.testing.assert_allclose([compiled.predict_one(record) for record in records], expected[:50], rtol=0, atol=1e-6)
+    np.testing.assert_allclose(compiled.churn_probabilities(records), expected[:50], rtol=0, atol=1e-6)
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from dashboard_scatter import DENSITY_BINS, FLAT_AXIS_PADDING, bin_edges, density_figure, tenure_charges_figure
+
+
+def test_bin_edges_widens_a_flat_axis():
+    edges = bin_edges(np.array([12.0, 12.0, 12.0]), 4)
+    assert edges[0] == 12.0 - FLAT_AXIS_PADDING
+    assert edges[-1] == 12.0 + FLAT_AXIS_PADDING
+    assert np.all(np.diff(edges) > 0)
+
+
+def test_density_figure_with_a_single_tenure_and_charge():
+    df = pd.DataFrame({'tenure': [5] * 20, 'MonthlyCharges': [70.35] * 20, 'Churn': ['Yes', 'No'] * 10})
+    fig = density_figure(df)
+    assert [int(np.sum(trace.z)) for trace in fig.data] == [10, 10]
+    assert [len(trace.x) for trace in fig.data] == [DENSITY_BINS[0]] * 2
+
+
+def test_large_flat_selection_uses_density_mode():
+    df = pd.DataFrame({'tenure': [1] * 50, 'MonthlyCharges': np.linspace(20, 90, 50), 'Churn': ['No'] * 50})
+    _, mode = tenure_charges_figure(df, max_points=10)
+    assert mode == 'density'
+
+
+def test_cube_density_cells_match_binning_the_selected_rows():
+    from dashboard_cube import AggregateCube
+    from dashboard_scatter import density_counts, density_grid
+    from data_store import load_customers
+    df = load_customers(missing_total_charges='drop')
+    grid = density_grid(df)
+    cube = AggregateCube(df, grid=grid)
+    filters = {'Contract': ['Month-to-month', 'One year'], 'InternetService': ['Fiber optic']}
+    selection = df[df['Contract'].isin(filters['Contract']) & df['InternetService'].isin(filters['InternetService'])]
+    expected = density_counts(selection, grid)
+    counts = cube.grid_counts(filters)
+    assert sorted(counts) == sorted(expected)
+    for label in expected:
+        np.testing.assert_array_equal(counts[label], expected[label])
+    assert sum(int(c.sum()) for c in counts.values()) == cube.totals(filters)['customers']
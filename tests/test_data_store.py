@@ -0,0 +1,20 @@
+import os
+
+import pandas as pd
+
+from data_store import RAW_CSV_PATH, load_customers
+
+
+def test_corrupt_store_is_rebuilt_from_the_csv(tmp_path):
+    store_path = str(tmp_path / 'customers.feather')
+    expected = load_customers(RAW_CSV_PATH, store_path)
+
+    with open(store_path, 'r+b') as f:
+        f.truncate(os.path.getsize(store_path) // 2)
+    pd.testing.assert_frame_equal(load_customers(RAW_CSV_PATH, store_path), expected)
+
+    with open(store_path, 'wb') as f:
+        f.write(b'not a feather file')
+    pd.testing.assert_frame_equal(load_customers(RAW_CSV_PATH, store_path), expected)
+    pd.testing.assert_frame_equal(load_customers(RAW_CSV_PATH, store_path), expected)
+    assert [name for name in os.listdir(tmp_path) if name.endswith('.tmp')] == []
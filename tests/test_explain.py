@@ -0,0 +1,31 @@
+import joblib
+import numpy as np
+from scipy.special import expit
+
+from explain import ExplanationCache, TreeExplainer
+from prediction_cache import PredictionCache
+
+
+def test_overwritten_model_is_explained_by_the_new_model(model_file, training_data, tmp_path):
+    path, swap = model_file
+    X, _ = training_data
+    customers = X.iloc[:100]
+    store_path = str(tmp_path / 'cache.sqlite')
+
+    explanations = ExplanationCache(joblib.load(path), path, store_path=store_path)
+    predictions = PredictionCache(joblib.load(path), path, store_path=store_path)
+    explanations.contributions(customers)
+
+    swap()
+    new_pipeline = joblib.load(path)
+    expected = TreeExplainer(new_pipeline).contributions(customers)
+    contributions = explanations.contributions(customers)
+    np.testing.assert_allclose(contributions, expected, atol=1e-5)
+
+    # Contributions still add up to the cached probability of the same model
+    probabilities = predictions.churn_probabilities(customers)
+    np.testing.assert_allclose(expit(contributions.sum(axis=1)), probabilities, atol=1e-5)
+
+    fresh = ExplanationCache(new_pipeline, path, store_path=store_path)
+    np.testing.assert_allclose(fresh.contributions(customers), expected, atol=1e-5)
+    assert fresh.stats()['store_hits'] == len(customers)
@@ -0,0 +1,23 @@
+from generate_report import RECOMMENDATIONS, recommendations
+from features import FEATURE_COLUMNS
+
+
+def _analysis(order):
+    return {'method': 'contributions', 'drivers': [
+        {'field': field, 'score': 1.0 / rank, 'share': 0.01, 'riskiest': 'No', 'riskiest_contribution': 0.1,
+         'direction': None}
+        for rank, field in enumerate(order, start=1)
+    ]}
+
+
+def test_recommendations_follow_the_driver_ranking():
+    content = {'churn_rate': 0.25, 'segments': {'Internet Service': [['Fiber optic', 100, 0.4]]}}
+    order = ['InternetService'] + [field for field in FEATURE_COLUMNS if field != 'InternetService']
+    result = recommendations(_analysis(order), content)
+
+    assert len(result) == len(RECOMMENDATIONS)
+    title, insight, _ = result[0]
+    assert title == "1. Investigate the Fiber Optic Experience."
+    assert insight.startswith(f"InternetService ranks #1 of {len(FEATURE_COLUMNS)} fields")
+    assert "Customers with Fiber optic internet service churn at 40.0%, against 25.0% overall." in insight
+    assert [title.split('. ')[0] for title, _, _ in result] == ['1', '2', '3', '4']
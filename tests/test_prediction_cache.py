@@ -0,0 +1,50 @@
+import joblib
+import numpy as np
+
+from prediction_cache import PredictionCache
+
+
+def test_overwritten_model_is_reloaded_and_stored_under_its_own_hash(model_file, training_data, tmp_path):
+    path, swap = model_file
+    X, _ = training_data
+    customers = X.iloc[:200]
+    store_path = str(tmp_path / 'cache.sqlite')
+
+    cache = PredictionCache(joblib.load(path), path, store_path=store_path)
+    first = cache.churn_probabilities(customers)
+    old_sha = cache.stats()['model_sha256']
+
+    swap()
+    new_pipeline = joblib.load(path)
+    expected = new_pipeline.predict_proba(customers)[:, 1]
+    assert not np.allclose(first, expected)
+
+    second = cache.churn_probabilities(customers)
+    np.testing.assert_array_equal(second, expected)
+    assert cache.stats()['model_sha256'] != old_sha
+    assert cache.stats()['reloads'] == 1
+
+    # Another process serving the new model reads the shared store
+    fresh = PredictionCache(new_pipeline, path, store_path=store_path)
+    np.testing.assert_array_equal(fresh.churn_probabilities(customers), expected)
+    assert fresh.stats()['store_hits'] == len(customers)
+
+
+def test_unchanged_model_is_served_from_the_cache(model_file, training_data):
+    path, _ = model_file
+    X, _ = training_data
+    cache = PredictionCache(joblib.load(path), path)
+    first = cache.churn_probabilities(X.iloc[:50])
+    np.testing.assert_array_equal(cache.churn_probabilities(X.iloc[:50]), first)
+    assert cache.stats()['hits'] == 50
+    assert cache.stats()['reloads'] == 0
+
+
+def test_float32_charges_share_keys_and_scores_with_the_float64_originals(training_data):
+    from prediction_cache import canonical_frame, frame_keys, record_key
+    X, _ = training_data
+    customers = X.iloc[:500].reset_index(drop=True)
+    stored = customers.astype({'MonthlyCharges': np.float32, 'TotalCharges': np.float32})
+    assert frame_keys(stored) == frame_keys(customers)
+    assert [record_key(record) for record in stored.to_dict('records')] == frame_keys(customers)
+    np.testing.assert_array_equal(canonical_frame(stored)['TotalCharges'], customers['TotalCharges'])
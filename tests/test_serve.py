@@ -0,0 +1,22 @@
+import pytest
+
+from serve import validate_record
+
+
+@pytest.fixture
+def record(training_data):
+    X, _ = training_data
+    return {col: value.item() if hasattr(value, 'item') else value for col, value in X.iloc[0].items()}
+
+
+@pytest.mark.parametrize('field, value', [('gender', 5), ('Contract', None), ('SeniorCitizen', 2),
+                                          ('PaymentMethod', 'cash')])
+def test_unknown_discrete_values_are_rejected_with_the_allowed_values(record, field, value):
+    with pytest.raises(ValueError, match=f"Field '{field}' must be one of"):
+        validate_record({**record, field: value})
+
+
+def test_valid_record_is_cleaned(record):
+    clean = validate_record({**record, 'SeniorCitizen': '1', 'tenure': '12'})
+    assert clean['SeniorCitizen'] == 1.0
+    assert clean['tenure'] == 12.0
@@ -0,0 +1,31 @@
+import joblib
+import numpy as np
+
+from model_registry import ShadowScorer
+
+
+class FailingModel:
+    def predict_proba(self, frame):
+        raise ValueError('feature mismatch')
+
+
+def test_failing_candidate_is_counted_and_active_scores_are_returned(two_models, training_data):
+    X, _ = training_data
+    active = joblib.load(two_models[0])
+    scorer = ShadowScorer(active, FailingModel())
+
+    for _ in range(2):
+        np.testing.assert_array_equal(scorer.predict_proba(X.iloc[:20]), active.predict_proba(X.iloc[:20]))
+
+    shadow = scorer.describe()['shadow']
+    assert shadow['candidate_failures'] == 2
+    assert shadow['rows'] == 0
+
+
+def test_working_candidate_is_compared(two_models, training_data):
+    X, _ = training_data
+    scorer = ShadowScorer(joblib.load(two_models[0]), joblib.load(two_models[1]))
+    scorer.predict_proba(X.iloc[:20])
+    shadow = scorer.describe()['shadow']
+    assert shadow['rows'] == 20
+    assert shadow['candidate_failures'] == 0
@@ -0,0 +1,119 @@
+import numpy as np
+import pandas as pd
+
+from features import FEATURE_COLUMNS, FIELD_OPTIONS, INTERNET_ADDONS
+from instrumentation import record_batch, timed
+
+# Default tenure x MonthlyCharges grid, covering the ranges in the Telco data
+TENURE_GRID = np.arange(0, 73, 6)
+CHARGES_GRID = np.arange(20.0, 121.0, 10.0)
+
+
+def _consistent_change(record, field, value):
+    """The record with field set to value, plus the dependent fields that change with it.
+
+    Dropping internet or phone service turns the add-ons into 'No internet/phone
+    service' and adding it back turns them into 'No', so every variant is a
+    customer that can actually exist.
+    """
+    changed = {field: value}
+    if field == 'InternetService':
+        if value == 'No':
+            changed.update({addon: 'No internet service' for addon in INTERNET_ADDONS})
+        elif record['InternetService'] == 'No':
+            changed.update({addon: 'No' for addon in INTERNET_ADDONS})
+    elif field == 'PhoneService':
+        if value == 'No':
+            changed['MultipleLines'] = 'No phone service'
+        elif record['MultipleLines'] == 'No phone service':
+            changed['MultipleLines'] = 'No'
+    return changed
+
+
+def _allowed(record, field, value):
+    """Skips values that contradict the customer's phone/internet service."""
+    if field in INTERNET_ADDONS:
+        return (value == 'No internet service') == (record['InternetService'] == 'No')
+    if field == 'MultipleLines':
+        return (value == 'No phone service') == (record['PhoneService'] == 'No')
+    return True
+
+
+def single_changes(record, tenure_values=TENURE_GRID, charge_values=CHARGES_GRID):
+    """Every one-field change to record as (field, new value, dict of updated columns)."""
+    changes = []
+    for field, options in FIELD_OPTIONS.items():
+        for value in options:
+            if value != record[field] and _allowed(record, field, value):
+                changes.append((field, value, _consistent_change(record, field, value)))
+    for tenure in tenure_values:
+        if tenure != record['tenure']:
+            # Billing history follows tenure, as in the grid
+            total = round(float(tenure) * float(record['MonthlyCharges']), 2)
+            changes.append(('tenure', int(tenure), {'tenure': int(tenure), 'TotalCharges': total}))
+    for charges in charge_values:
+        if charges != record['MonthlyCharges']:
+            changes.append(('MonthlyCharges', float(charges), {'MonthlyCharges': float(charges)}))
+    return changes
+
+
+def build_variants(record, tenure_values=TENURE_GRID, charge_values=CHARGES_GRID):
+    """One frame holding the base customer, every single change and the tenure x charges grid.
+
+    Returns (frame, changes, grid_shape): row 0 is the customer as entered,
+    the next len(changes) rows follow single_changes and the rest is the grid
+    in row-major (tenure, MonthlyCharges) order. Grid rows set TotalCharges to
+    tenure x MonthlyCharges so the three stay consistent.
+    """
+    changes = single_changes(record, tenure_values, charge_values)
+    tenure_grid, charge_grid = np.meshgrid(tenure_values, charge_values, indexing='ij')
+    n_rows = 1 + len(changes) + tenure_grid.size
+
+    columns = {col: np.repeat(np.array([record[col]], dtype=object), n_rows) for col in FEATURE_COLUMNS}
+    for i, (_, _, updates) in enumerate(changes, start=1):
+        for col, value in updates.items():
+            columns[col][i] = value
+    grid = slice(1 + len(changes), n_rows)
+    columns['tenure'][grid] = tenure_grid.ravel()
+    columns['MonthlyCharges'][grid] = charge_grid.ravel()
+    columns['TotalCharges'][grid] = (tenure_grid * charge_grid).ravel().round(2)
+
+    frame = pd.DataFrame(columns)
+    for col in ('SeniorCitizen', 'tenure'):
+        frame[col] = frame[col].astype(np.int64)
+    for col in ('MonthlyCharges', 'TotalCharges'):
+        frame[col] = frame[col].astype(np.float64)
+    return frame, changes, tenure_grid.shape
+
+
+def sweep(model, record, tenure_values=TENURE_GRID, charge_values=CHARGES_GRID):
+    """Scores every what-if variant of record in one predict_proba call.
+
+    Returns (base probability, single-change table sorted by churn reduction,
+    tenure x MonthlyCharges probability grid).
+    """
+    frame, changes, grid_shape = build_variants(record, tenure_values, charge_values)
+    record_batch('what_if', len(frame))
+    with timed('model.what_if'):
+        probabilities = model.predict_proba(frame)[:, 1].astype(np.float64)
+    base = probabilities[0]
+
+    n_changes = len(changes)
+    table = pd.DataFrame({
+        'field': [field for field, _, _ in changes],
+        'current': [record[field] for field, _, _ in changes],
+        'new_value': [value for _, value, _ in changes],
+        'churn_probability': probabilities[1:1 + n_changes],
+    })
+    table['change'] = table['churn_probability'] - base
+    table = table.sort_values('change', kind='stable').reset_index(drop=True)
+
+    grid = pd.DataFrame(probabilities[1 + n_changes:].reshape(grid_shape),
+                        index=pd.Index(tenure_values, name='tenure'),
+                        columns=pd.Index(charge_values, name='MonthlyCharges'))
+    return base, table, grid
+
+
+def best_reductions(table, k=10):
+    """The k single changes that lower churn probability the most."""
+    return table[table['change'] < 0].head(k)